@@ -1,73 +1,217 @@
-from flask import Flask, render_template, request, redirect, url_for
-import requests
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify, make_response, g, stream_with_context
+import hashlib
+import json
+import math
+import os
+import random
+import threading
 import time
-from services.all_key_service import AllKeyService
-from services.balance_service import BalanceService
-from models.all_key import AllKey
-from models.blockchain import Blockchain
-from config import ADDRESSES_PER_PAGE, BITCOIN_MAX_NUMBER, FLASK_HOST, FLASK_PORT, FLASK_DEBUG, ENABLE_BALANCE_CHECKING, MAX_SEARCH_PAGES
+from config import (ADDRESSES_PER_PAGE, BITCOIN_MAX_NUMBER, FLASK_HOST, FLASK_PORT, FLASK_DEBUG, ENABLE_BALANCE_CHECKING, MAX_SEARCH_PAGES,
+                    PAGE_CONTENT_VERSION, KEY_PAGE_CACHE_MAX_AGE, BALANCE_CACHE_TTL, ENABLE_PREFETCH,
+                    BATCH_SEARCH_MAX_PAGES, BATCH_SEARCH_MAX_TARGETS, ENABLE_SHARED_CACHE, ENABLE_ADMISSION_CONTROL,
+                    RANGE_INDEX_PATH, EXPORT_MAX_PAGES, DERIVE_TAPROOT_ADDRESSES)
+from services.admission_control import AdmissionController, Overloaded
+from services.prefetch_service import RequestTracker
 
-app = Flask(__name__)
+# Services are created on first use; the key and balance services pull in
+# ecdsa, base58 and requests, which cheap routes should never pay for
+_all_key_service = None
+_balance_service = None
+_prefetch_service = None
+_search_service = None
+_shared_cache = None
+_range_index = (None, None)  # (file mtime, RangeIndex)
+_services_lock = threading.Lock()
+_admission_controller = AdmissionController()
+_request_tracker = RequestTracker()  # counts from the first request, before the prefetcher exists
 
-# Initialize services
-all_key_service = AllKeyService()
-balance_service = BalanceService()
+# Monitoring must keep answering while the lanes are saturated
+UNMETERED_ENDPOINTS = {None, 'static', 'admission_stats', 'balance_stats', 'cache_stats'}
+
+def get_shared_cache():
+    """Get the host-wide SharedCache (None when disabled), mapping it on first use"""
+    global _shared_cache
+    if _shared_cache is None and ENABLE_SHARED_CACHE:
+        with _services_lock:
+            if _shared_cache is None:
+                from services.shared_cache import SharedCache
+                _shared_cache = SharedCache()
+    return _shared_cache
+
+def get_all_key_service():
+    """Get the shared AllKeyService, creating it on first use"""
+    global _all_key_service
+    if _all_key_service is None:
+        shared_cache = get_shared_cache()
+        with _services_lock:
+            if _all_key_service is None:
+                from services.all_key_service import AllKeyService
+                _all_key_service = AllKeyService(shared_cache)
+    return _all_key_service
+
+def get_balance_service():
+    """Get the shared BalanceService, creating it on first use"""
+    global _balance_service
+    if _balance_service is None:
+        shared_cache = get_shared_cache()
+        with _services_lock:
+            if _balance_service is None:
+                from services.balance_service import BalanceService
+                _balance_service = BalanceService(shared_cache=shared_cache)
+    return _balance_service
+
+def get_range_index():
+    """Get the saved RangeIndex (None if not built), reloading it when the file is rebuilt"""
+    global _range_index
+    try:
+        mtime = os.stat(RANGE_INDEX_PATH).st_mtime
+    except OSError:
+        return None
+    if _range_index[0] != mtime:
+        with _services_lock:
+            if _range_index[0] != mtime:
+                from services.range_index import RangeIndex
+                _range_index = (mtime, RangeIndex.load(RANGE_INDEX_PATH))
+    return _range_index[1]
+
+def get_search_service():
+    """Get the shared SearchService, creating it on first use"""
+    global _search_service
+    if _search_service is None:
+        all_key_service = get_all_key_service()
+        with _services_lock:
+            if _search_service is None:
+                from services.search_service import SearchService
+                _search_service = SearchService(all_key_service)
+    return _search_service
+
+def get_prefetch_service():
+    """Get the shared PrefetchService, creating it on first use"""
+    global _prefetch_service
+    if _prefetch_service is None:
+        all_key_service = get_all_key_service()
+        balance_service = get_balance_service() if ENABLE_BALANCE_CHECKING else None
+        with _services_lock:
+            if _prefetch_service is None:
+                from services.prefetch_service import PrefetchService
+                _prefetch_service = PrefetchService(all_key_service, balance_service, _request_tracker)
+    return _prefetch_service
+
+def track_request_start():
+    # Foreground requests always take priority over prefetching
+    _request_tracker.started()
+    g.request_tracked = True
+
+def track_request_end(exc=None):
+    if g.pop('request_tracked', False):
+        _request_tracker.finished()
+
+def estimate_request_cost():
+    """(lane, estimated keys derived) for the current request, from its route and parameters"""
+    endpoint = request.endpoint
+    try:
+        if endpoint == 'balance_scan' and request.args.get('max_pages', '').strip():
+            return 'heavy', int(request.args['max_pages']) * ADDRESSES_PER_PAGE
+        if endpoint == 'search' and request.args.get('address', '').strip():
+            return 'heavy', MAX_SEARCH_PAGES * ADDRESSES_PER_PAGE
+        if endpoint == 'export_keys':
+            return 'heavy', int(request.args.get('pages', 1)) * ADDRESSES_PER_PAGE
+        if endpoint == 'batch_search':
+            payload = request.get_json(silent=True) if request.is_json else None
+            max_pages = (payload or {}).get('max_pages', request.args.get('max_pages', MAX_SEARCH_PAGES))
+            return 'heavy', int(max_pages) * ADDRESSES_PER_PAGE
+    except (TypeError, ValueError, AttributeError):
+        # Unparseable parameters are rejected by the view itself; charge the default
+        return 'heavy', MAX_SEARCH_PAGES * ADDRESSES_PER_PAGE
+    if endpoint in ('home_page', 'page_balances'):
+        return 'browse', ADDRESSES_PER_PAGE
+    return 'browse', 0
+
+def admit_request():
+    """Queue or shed the request according to its lane; a 503 with Retry-After when the lane is saturated"""
+    if not ENABLE_ADMISSION_CONTROL or request.endpoint in UNMETERED_ENDPOINTS:
+        return None
+    lane_name, cost = estimate_request_cost()
+    lane = _admission_controller.lanes[lane_name]
+    try:
+        charged = lane.acquire(max(0, cost))
+    except Overloaded as e:
+        if request.path.startswith('/api/'):
+            response = jsonify({'error': 'Server busy', 'lane': e.lane, 'retry_after': e.retry_after})
+        else:
+            response = make_response(f"Server busy ({e.lane} requests {e.reason}), please retry in {e.retry_after}s")
+            response.mimetype = 'text/plain'
+        response.status_code = 503
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    g.admission = (lane, charged, time.monotonic())
+    return None
+
+def release_admission(admission):
+    lane, charged, started_at = admission
+    lane.release(charged, time.monotonic() - started_at)
+
+def release_request(exc=None):
+    admission = g.pop('admission', None)
+    if admission is not None:
+        release_admission(admission)
+
+def hold_admission(response):
+    """Keep the request's lane slot until a streamed body has been sent (or the client went away)
+    
+    Teardown runs as soon as the view returns, before a streamed body is
+    generated, so the slot is handed to the response's close callback.
+    """
+    admission = g.pop('admission', None)
+    if admission is not None:
+        response.call_on_close(lambda: release_admission(admission))
+    return response
 
-@app.route('/')
 def home():
     return redirect(url_for('home_page', page=1))
 
-@app.route('/home')
 def home_page():
-    page = int(request.args.get('page', 1))
     limit_per_page = ADDRESSES_PER_PAGE
+    max_page = BITCOIN_MAX_NUMBER // limit_per_page
+    try:
+        page = int(request.args.get('page', 1))
+    except ValueError:
+        return make_response('Invalid page number', 400)
+    if page < 1 or page > max_page:
+        return redirect(url_for('home_page', page=min(max(page, 1), max_page)))
+    
+    # The key table is a pure function of the page number, so a client that
+    # already holds this page is answered without deriving a single key
+    etag = key_page_etag(page, limit_per_page)
+    
+    if request.if_none_match.contains(etag):
+        return cache_key_page(make_response('', 304), etag)
+    
+    # Visitors browse with Previous/Next, so warm the neighbors once we are idle
+    if ENABLE_PREFETCH:
+        get_prefetch_service().schedule(page)
     
     # Get Bitcoin keys and addresses
-    items = all_key_service.get_data(page, limit_per_page)
+    items = get_all_key_service().get_data(page, limit_per_page)
+    
+    # Balances are volatile, so they are not baked into the cached page;
+    # the template fetches them from /api/balances (short TTL) instead
+    for item in items:
+        item.address_compressed_balance = None
+        item.address_compressed_received = None
+        item.address_uncompressed_balance = None
+        item.address_uncompressed_received = None
     
-    # Update items with balance information (if enabled)
+    # Page totals are filled in by the balance request when balance checking is on
     if ENABLE_BALANCE_CHECKING:
-        # Prepare addresses for balance checking
-        addresses = []
-        for item in items:
-            addresses.append(item.address_compressed)
-            addresses.append(item.address_uncompressed)
-        
-        # Fetch balance data
-        balance_list = balance_service.get_balance(addresses)
-        
-        # Update items with balance information
-        for item in items:
-            item.address_compressed_balance = get_balance(
-                item.address_compressed, balance_list, 'final_balance'
-            )
-            item.address_compressed_received = get_balance(
-                item.address_compressed, balance_list, 'total_received'
-            )
-            item.address_uncompressed_balance = get_balance(
-                item.address_uncompressed, balance_list, 'final_balance'
-            )
-            item.address_uncompressed_received = get_balance(
-                item.address_uncompressed, balance_list, 'total_received'
-            )
+        page_total_balance = None
+        page_total_received = None
     else:
-        # Set all balances to None for fast loading
-        for item in items:
-            item.address_compressed_balance = None
-            item.address_compressed_received = None
-            item.address_uncompressed_balance = None
-            item.address_uncompressed_received = None
-    
-    # Calculate pagination - use the actual Bitcoin max number for scientific notation
-    # This will show the true scale in scientific notation
-    max_page = BITCOIN_MAX_NUMBER // limit_per_page
-    
-    # Calculate total balance and received for this page
-    page_total_balance = calculate_page_total_balance(items)
-    page_total_received = calculate_page_total_received(items)
+        page_total_balance = calculate_page_total_balance(items)
+        page_total_received = calculate_page_total_received(items)
     page_percentage = calculate_page_percentage(page, max_page)
     
-    return render_template('home.html', 
+    html = render_template('home.html', 
                          items=items, 
                          page=page, 
                          max_page=max_page,
@@ -76,23 +220,118 @@ def home_page():
                          page_percentage=page_percentage,
                          table_header_columns=[
                              'privateKey', 'address', 'balance', 'received',
-                             'compressed', 'balance', 'received'
+                             'compressed', 'balance', 'received', 'segwit'
                          ])
+    return cache_key_page(make_response(html), etag)
+
+def page_balances():
+    """Balance data for one key page, cached for BALANCE_CACHE_TTL seconds"""
+    max_page = BITCOIN_MAX_NUMBER // ADDRESSES_PER_PAGE
+    try:
+        page = int(request.args.get('page', 1))
+    except ValueError:
+        return jsonify({'error': 'Invalid page number'}), 400
+    if page < 1 or page > max_page:
+        return jsonify({'error': f'page must be between 1 and {max_page}'}), 400
+    items = get_all_key_service().get_data(page, ADDRESSES_PER_PAGE)
+    
+    balances = {}
+    failed = []
+    if ENABLE_BALANCE_CHECKING:
+        addresses = []
+        for item in items:
+            addresses.append(item.address_compressed)
+            addresses.append(item.address_uncompressed)
+        
+        balance_list = get_balance_service().get_balance(addresses, failed)
+        
+        # Only addresses with activity are sent; the page treats the rest as zero
+        for address in addresses:
+            final_balance = get_balance(address, balance_list, 'final_balance')
+            total_received = get_balance(address, balance_list, 'total_received')
+            if final_balance or total_received:
+                balances[address] = [final_balance, total_received]
+    
+    response = jsonify({
+        'page': page,
+        'balances': balances,
+        'page_total_balance': sum(entry[0] for entry in balances.values()),
+        'page_total_received': sum(entry[1] for entry in balances.values())
+    })
+    if failed:
+        # Zeros standing in for an unanswered chunk must not be kept anywhere
+        response.cache_control.no_store = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = BALANCE_CACHE_TTL
+    response.add_etag()
+    return response.make_conditional(request)
+
+def balance_stats():
+    """Provider latency percentiles, breaker states and page-level balance latency"""
+    if _balance_service is None:
+        return jsonify({'providers': [], 'page_latency': None})
+    response = jsonify(_balance_service.stats())
+    response.cache_control.no_store = True
+    return response
+
+def admission_stats():
+    """Per-lane activity, queue depth and shed counts"""
+    response = jsonify(_admission_controller.stats())
+    response.cache_control.no_store = True
+    return response
+
+def cache_stats():
+    """Host-wide shared cache layout and this worker's hit counters"""
+    response = jsonify(_shared_cache.stats() if _shared_cache is not None else {'enabled': False})
+    response.cache_control.no_store = True
+    return response
+
+def range_totals():
+    """Balance, received and funded-address totals over a page range, from the range index"""
+    try:
+        start_page = int(request.args.get('start_page', 1))
+        end_page = int(request.args.get('end_page', start_page))
+    except ValueError:
+        return jsonify({'error': 'start_page and end_page must be integers'}), 400
+    if end_page < start_page:
+        return jsonify({'error': 'end_page must not be before start_page'}), 400
+    
+    index = get_range_index()
+    if index is None or index.limit_per_page != ADDRESSES_PER_PAGE:
+        return jsonify({'error': 'No range index; build one with: python snapshot_tool.py index --pages N'}), 404
+    totals = index.query(start_page, end_page)
+    if totals is None:
+        return jsonify({'error': f"Pages {index.start_page}-{index.end_page} are indexed", 'index': index.stats()}), 404
+    
+    response = jsonify(dict(totals, index=index.stats()))
+    response.cache_control.public = True
+    response.cache_control.max_age = BALANCE_CACHE_TTL
+    return response
+
+def key_page_etag(page, limit_per_page):
+    """Strong ETag for a key page, derived from everything the page content depends on"""
+    key = f"{PAGE_CONTENT_VERSION}:{limit_per_page}:{page}:{int(DERIVE_TAPROOT_ADDRESSES)}:{int(ENABLE_BALANCE_CHECKING)}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+def cache_key_page(response, etag):
+    """Mark a key page response as immutable and long-lived"""
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = KEY_PAGE_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
 
-@app.route('/about')
 def about():
     return render_template('about.html')
 
-@app.route('/random')
 def random_page():
     """Redirect to a random page"""
-    import random
     limit_per_page = ADDRESSES_PER_PAGE
     max_page = BITCOIN_MAX_NUMBER // limit_per_page
     random_page_num = random.randint(1, max_page)
     return redirect(url_for('home_page', page=random_page_num))
 
-@app.route('/balance-scan')
 def balance_scan():
     """Scan pages for addresses with balances"""
     start_page = request.args.get('start_page', '').strip()
@@ -116,6 +355,12 @@ def balance_scan():
                                  start_page=start_page,
                                  max_pages=max_pages,
                                  error="Max pages must be between 1 and 50 (Vercel optimized)")
+        max_page = BITCOIN_MAX_NUMBER // ADDRESSES_PER_PAGE
+        if start_page + max_pages - 1 > max_page:
+            return render_template('balance_scan.html', 
+                                 start_page=start_page,
+                                 max_pages=max_pages,
+                                 error=f"The last page is {max_page}")
     except ValueError:
         return render_template('balance_scan.html', 
                              start_page=start_page,
@@ -131,7 +376,6 @@ def balance_scan():
                          results=results,
                          total_found=len(results))
 
-@app.route('/search')
 def search():
     """Search for a specific Bitcoin address and find which page it's on"""
     address = request.args.get('address', '').strip()
@@ -152,14 +396,21 @@ def search():
                                  address=address, 
                                  start_page=start_page,
                                  error="Starting page must be 1 or greater")
+        max_page = BITCOIN_MAX_NUMBER // ADDRESSES_PER_PAGE
+        if start_page > max_page:
+            return render_template('search.html', 
+                                 address=address, 
+                                 start_page=start_page,
+                                 error=f"The last page is {max_page}")
     except ValueError:
         return render_template('search.html', 
                              address=address, 
                              start_page=start_page,
                              error="Invalid starting page number")
     
-    # Search for the address
-    result = find_address_page(address, start_page)
+    # Search for the address; near the end of the keyspace the range stops at the last page
+    search_pages = min(MAX_SEARCH_PAGES, max_page - start_page + 1)
+    result = find_address_page(address, start_page, search_pages)
     
     if result:
         return render_template('search.html', 
@@ -168,43 +419,113 @@ def search():
                              page=result['page'], 
                              position=result['position'],
                              private_key=result['private_key'],
-                             is_compressed=result['is_compressed'])
+                             is_compressed=result['is_compressed'],
+                             address_type=result['address_type'])
     else:
         return render_template('search.html', 
                              address=address, 
                              start_page=start_page,
-                             error=f"Address not found in pages {start_page} to {start_page + MAX_SEARCH_PAGES - 1}")
+                             error=f"Address not found in pages {start_page} to {start_page + search_pages - 1}")
 
-def find_address_page(target_address, start_page=1):
+def find_address_page(target_address, start_page=1, max_pages=MAX_SEARCH_PAGES):
     """Find which page contains a specific Bitcoin address"""
-    # We need to search through the generated addresses
-    # This is computationally expensive, so we'll use a smart search approach
-    
-    # Search through MAX_SEARCH_PAGES starting from the specified start_page
-    end_page = start_page + MAX_SEARCH_PAGES - 1
-    
-    for page in range(start_page, end_page + 1):
-        items = all_key_service.get_data(page, ADDRESSES_PER_PAGE)
-        
-        for i, item in enumerate(items):
-            if item.address_compressed == target_address:
-                return {
-                    'page': page,
-                    'position': i + 1,
-                    'private_key': item.private_key,
-                    'is_compressed': True
-                }
-            elif item.address_uncompressed == target_address:
-                return {
-                    'page': page,
-                    'position': i + 1,
-                    'private_key': item.private_key,
-                    'is_compressed': False
-                }
+    # Search through max_pages starting from the specified start_page
+    search_service = get_search_service()
+    targets, _ = search_service.build_targets([target_address])
+    for match in search_service.search(targets, start_page, max_pages):
+        return {
+            'page': match['page'],
+            'position': match['position'],
+            'private_key': match['private_key'],
+            'is_compressed': match['is_compressed'],
+            'address_type': match['address_type']
+        }
     
     # If not found in the search range, return None
     return None
 
+def batch_search():
+    """Search many addresses in one sweep of a page range, streaming matches as NDJSON"""
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if payload is None:
+            payload = {}
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'Expected a JSON object with an addresses list'}), 400
+        addresses = payload.get('addresses', [])
+        start_page = payload.get('start_page', 1)
+        max_pages = payload.get('max_pages', MAX_SEARCH_PAGES)
+    else:
+        # Plain text body, one address per line
+        addresses = request.get_data(as_text=True).splitlines()
+        start_page = request.args.get('start_page', 1)
+        max_pages = request.args.get('max_pages', MAX_SEARCH_PAGES)
+    
+    try:
+        start_page = int(start_page)
+        max_pages = int(max_pages)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid page numbers'}), 400
+    if start_page < 1 or max_pages < 1 or max_pages > BATCH_SEARCH_MAX_PAGES:
+        return jsonify({'error': f'start_page must be 1 or greater and max_pages between 1 and {BATCH_SEARCH_MAX_PAGES}'}), 400
+    max_page = BITCOIN_MAX_NUMBER // ADDRESSES_PER_PAGE
+    if start_page + max_pages - 1 > max_page:
+        return jsonify({'error': f'The last page is {max_page}'}), 400
+    if not isinstance(addresses, list) or len(addresses) > BATCH_SEARCH_MAX_TARGETS:
+        return jsonify({'error': f'Provide a list of at most {BATCH_SEARCH_MAX_TARGETS} addresses'}), 400
+    
+    search_service = get_search_service()
+    targets, invalid = search_service.build_targets([str(address) for address in addresses])
+    
+    def generate():
+        found = set()
+        for match in search_service.search(targets, start_page, max_pages):
+            found.add(match['address'])
+            yield json.dumps(dict(match, type='match')) + '\n'
+        yield json.dumps({
+            'type': 'done',
+            'start_page': start_page,
+            'end_page': start_page + max_pages - 1,
+            'found': len(found),
+            'not_found': [address for address in targets.values() if address not in found],
+            'invalid': invalid
+        }) + '\n'
+    
+    return hold_admission(Response(stream_with_context(generate()), mimetype='application/x-ndjson'))
+
+def export_keys():
+    """Stream a page range in the columnar binary export format (see services/key_export.py)"""
+    try:
+        start_page = int(request.args.get('start_page', 1))
+        pages = int(request.args.get('pages', 1))
+    except ValueError:
+        return jsonify({'error': 'Invalid page numbers'}), 400
+    if start_page < 1 or pages < 1 or pages > EXPORT_MAX_PAGES:
+        return jsonify({'error': f'start_page must be 1 or greater and pages between 1 and {EXPORT_MAX_PAGES}'}), 400
+    max_page = BITCOIN_MAX_NUMBER // ADDRESSES_PER_PAGE
+    if start_page + pages - 1 > max_page:
+        return jsonify({'error': f'The last page is {max_page}'}), 400
+    
+    from services.key_export import KeyExporter
+    snapshot = None
+    if request.args.get('balances') in ('1', 'true'):
+        from services.balance_snapshot import BalanceSnapshot
+        snapshot = BalanceSnapshot()
+        if not snapshot.exists():
+            return jsonify({'error': 'No local balance snapshot to export balances from'}), 404
+    exporter = KeyExporter(get_all_key_service(), snapshot)
+    
+    def generate():
+        try:
+            yield from exporter.iter_raw(start_page, pages)
+        finally:
+            if snapshot is not None:
+                snapshot.close()
+    
+    response = Response(stream_with_context(generate()), mimetype='application/octet-stream')
+    response.headers['Content-Disposition'] = f'attachment; filename="keys-{start_page}-{start_page + pages - 1}.bin"'
+    return hold_admission(response)
+
 def get_balance(address, balance_list, balance_type):
     """Get balance for a specific address and type"""
     if address in balance_list:
@@ -227,6 +548,16 @@ def format_balance(balance):
         return f"{balance / (10**8):.5f} BTC"
     return "..."
 
+def format_address_type(address_type):
+    """Human-readable name for an address type reported by search"""
+    return {
+        'p2pkh_uncompressed': 'Uncompressed (P2PKH)',
+        'p2pkh_compressed': 'Compressed (P2PKH)',
+        'p2wpkh': 'Native SegWit (P2WPKH)',
+        'p2sh_p2wpkh': 'Nested SegWit (P2SH-P2WPKH)',
+        'p2tr': 'Taproot (P2TR)'
+    }.get(address_type, address_type)
+
 def truncate_text(text, start_chars=4, end_chars=3):
     """Truncate text to show only start and end characters with dots in between"""
     if not text or len(text) <= start_chars + end_chars:
@@ -262,7 +593,6 @@ def format_scientific_notation(number):
             return str(number)
         else:
             # Convert to scientific notation
-            import math
             exponent = int(math.log10(number))
             coefficient = number / (10 ** exponent)
             
@@ -316,7 +646,7 @@ def scan_pages_for_balances(start_page, max_pages):
     # Collect all addresses from all pages first
     all_items = []
     for page in range(start_page, end_page + 1):
-        items = all_key_service.get_data(page, ADDRESSES_PER_PAGE)
+        items = get_all_key_service().get_data(page, ADDRESSES_PER_PAGE)
         for item in items:
             item.page_number = page  # Store page number with item
             all_items.append(item)
@@ -328,7 +658,7 @@ def scan_pages_for_balances(start_page, max_pages):
         all_addresses.append(item.address_uncompressed)
     
     # Single batch API call for all addresses (much faster!)
-    balance_list = balance_service.get_balance(all_addresses)
+    balance_list = get_balance_service().get_balance(all_addresses)
     
     # Process results
     for item in all_items:
@@ -350,28 +680,63 @@ def scan_pages_for_balances(start_page, max_pages):
     
     return results
 
-# Make functions available in templates
-app.jinja_env.globals.update(
-    get_balance_class=get_balance_class,
-    format_balance=format_balance,
-    truncate_text=truncate_text,
-    format_page_number=format_page_number,
-    format_scientific_notation=format_scientific_notation,
-    calculate_page_total_balance=calculate_page_total_balance,
-    calculate_page_percentage=calculate_page_percentage,
-    MAX_SEARCH_PAGES=MAX_SEARCH_PAGES,
-    ADDRESSES_PER_PAGE=ADDRESSES_PER_PAGE
-)
+def create_app():
+    """Create the Flask application
+    
+    Services are built on first use, so importing this module (a serverless
+    cold start) and serving static pages like /about never load the crypto
+    or HTTP client libraries.
+    """
+    app = Flask(__name__)
+    
+    app.add_url_rule('/', 'home', home)
+    app.add_url_rule('/home', 'home_page', home_page)
+    app.add_url_rule('/api/balances', 'page_balances', page_balances)
+    app.add_url_rule('/api/balance-stats', 'balance_stats', balance_stats)
+    app.add_url_rule('/api/cache-stats', 'cache_stats', cache_stats)
+    app.add_url_rule('/api/admission-stats', 'admission_stats', admission_stats)
+    app.add_url_rule('/api/range-totals', 'range_totals', range_totals)
+    app.add_url_rule('/about', 'about', about)
+    app.add_url_rule('/random', 'random_page', random_page)
+    app.add_url_rule('/balance-scan', 'balance_scan', balance_scan)
+    app.add_url_rule('/search', 'search', search)
+    app.add_url_rule('/api/batch-search', 'batch_search', batch_search, methods=['POST'])
+    app.add_url_rule('/api/export', 'export_keys', export_keys)
+    
+    app.before_request(admit_request)
+    app.before_request(track_request_start)
+    app.teardown_request(track_request_end)
+    app.teardown_request(release_request)
+    
+    # Make functions available in templates
+    app.jinja_env.globals.update(
+        get_balance_class=get_balance_class,
+        format_balance=format_balance,
+        format_address_type=format_address_type,
+        truncate_text=truncate_text,
+        format_page_number=format_page_number,
+        format_scientific_notation=format_scientific_notation,
+        calculate_page_total_balance=calculate_page_total_balance,
+        calculate_page_percentage=calculate_page_percentage,
+        MAX_SEARCH_PAGES=MAX_SEARCH_PAGES,
+        ADDRESSES_PER_PAGE=ADDRESSES_PER_PAGE,
+        ENABLE_BALANCE_CHECKING=ENABLE_BALANCE_CHECKING
+    )
+    
+    return app
 
 # For Vercel deployment
-app = app
+app = create_app()
 
 def cleanup_resources():
     """Clean up resources on shutdown"""
     try:
+        # Only services that were actually built need cleaning up
+        if _prefetch_service is not None:
+            _prefetch_service.shutdown()
         # Clean up balance service
-        if hasattr(balance_service, '_cleanup'):
-            balance_service._cleanup()
+        if _balance_service is not None:
+            _balance_service._cleanup()
     except Exception as e:
         print(f"Error during cleanup: {e}")
 
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Measure balance lookup tail latency against local stand-in providers
+
+Usage:
+    python balance_benchmark.py --pages 200 --slow-rate 0.03 --slow-latency 1.0
+    python balance_benchmark.py --error-rate 0.2
+
+A primary blockchain.info-style server injects slow and failing responses;
+a healthy mirror (blockchain.info-style by default, or Esplora-style with
+--secondary esplora) is the hedge target. Each page looks up a fresh set
+of addresses, once with hedging off and once with it on; the first
+--warmup pages only fill the latency windows and are not reported.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.balance_providers import BlockchainInfoProvider, EsploraProvider, LatencyTracker
+from services.balance_service import BalanceService
+from services.mock_balance_server import MockBalanceServer
+
+def run(hedge, args):
+    primary = MockBalanceServer(latency=args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+                                error_rate=args.error_rate, seed=1).start()
+    secondary = MockBalanceServer(latency=args.latency, seed=2).start()
+    try:
+        if args.secondary == 'esplora':
+            fallback = EsploraProvider(secondary.url)
+        else:
+            fallback = BlockchainInfoProvider(secondary.blockchain_info_url)
+        service = BalanceService([BlockchainInfoProvider(primary.blockchain_info_url), fallback], hedge=hedge)
+        service.cache_ttl = 0
+        for page in range(args.warmup + args.pages):
+            if page == args.warmup:
+                service.page_latency = LatencyTracker(args.pages)
+            service.get_balance([f"page{page}-address{i}" for i in range(args.addresses)])
+        return service.stats()
+    finally:
+        primary.stop()
+        secondary.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Balance lookup latency with and without hedged requests")
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20, help="pages run before measuring")
+    parser.add_argument('--addresses', type=int, default=100, help="addresses per page")
+    parser.add_argument('--secondary', choices=('blockchain_info', 'esplora'), default='blockchain_info')
+    parser.add_argument('--latency', type=float, default=0.01, help="normal response time in seconds")
+    parser.add_argument('--slow-rate', type=float, default=0.03, help="fraction of slow primary responses")
+    parser.add_argument('--slow-latency', type=float, default=1.0, help="slow response time in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of failed primary responses")
+    args = parser.parse_args()
+
+    print(f"{'hedging':<8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'hedges':>7} {'won':>5} {'failed':>7}  breakers (primary/secondary)")
+    for hedge in (False, True):
+        stats = run(hedge, args)
+        page = stats['page_latency']
+        breakers = '/'.join(provider['breaker'] for provider in stats['providers'])
+        print(f"{'on' if hedge else 'off':<8} {page['p50_ms']:>8} {page['p95_ms']:>8} {page['p99_ms']:>8} "
+              f"{stats['hedges']:>7} {stats['hedge_wins']:>5} {stats['failed_chunks']:>7}  {breakers}")
+
+if __name__ == "__main__":
+    main()
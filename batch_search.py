@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Search for many Bitcoin addresses in a single sweep of a page range
+
+Usage:
+    python batch_search.py addresses.txt --start-page 1 --pages 1000
+    cat addresses.txt | python batch_search.py - --pages 100
+
+Matches are printed as JSON lines as soon as they are found.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.all_key_service import AllKeyService
+from services.search_service import SearchService
+from config import ADDRESSES_PER_PAGE, BITCOIN_MAX_NUMBER, MAX_SEARCH_PAGES
+
+def main():
+    """Run a batch search from the command line"""
+    parser = argparse.ArgumentParser(description="Find many addresses in one pass over a key range")
+    parser.add_argument('file', help="file with one address per line, or - for stdin")
+    parser.add_argument('--start-page', type=int, default=1, help="first page to search (default: 1)")
+    parser.add_argument('--pages', type=int, default=MAX_SEARCH_PAGES,
+                        help=f"number of pages to search (default: {MAX_SEARCH_PAGES})")
+    args = parser.parse_args()
+
+    max_page = BITCOIN_MAX_NUMBER // ADDRESSES_PER_PAGE
+    if args.start_page < 1 or args.pages < 1 or args.start_page + args.pages - 1 > max_page:
+        raise SystemExit(f"Pages must lie within 1-{max_page}")
+
+    if args.file == '-':
+        addresses = sys.stdin.read().splitlines()
+    else:
+        with open(args.file) as f:
+            addresses = f.read().splitlines()
+
+    search_service = SearchService(AllKeyService())
+    targets, invalid = search_service.build_targets(addresses)
+    for address in invalid:
+        print(f"Skipping unsupported address: {address}", file=sys.stderr)
+
+    print(f"Searching {len(targets)} addresses in pages {args.start_page} to "
+          f"{args.start_page + args.pages - 1}...", file=sys.stderr)
+    start = time.perf_counter()
+    found = 0
+    for match in search_service.search(targets, args.start_page, args.pages):
+        found += 1
+        print(json.dumps(match), flush=True)
+
+    elapsed = time.perf_counter() - start
+    keys = args.pages * ADDRESSES_PER_PAGE
+    print(f"Found {found} of {len(targets)} addresses; swept up to {keys:,} keys in {elapsed:.2f}s",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
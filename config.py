@@ -2,18 +2,95 @@
 Configuration settings for the All Bitcoin Private Key application
 """
 
+import os
+import tempfile
+
 # Number of addresses to display per page
 ADDRESSES_PER_PAGE = 500
 
 # Performance options
 ENABLE_BALANCE_CHECKING = True  # Set to True for balance scanning functionality
 MAX_SEARCH_PAGES = 100   # Maximum pages to search through for address lookup (reduced for Vercel)
+BATCH_SEARCH_MAX_PAGES = 1000     # Maximum pages one /api/batch-search request may sweep
+BATCH_SEARCH_MAX_TARGETS = 100000 # Maximum addresses per /api/batch-search request
 
 # API configuration - Optimized for Vercel serverless
-API_REQUEST_DELAY = 0.2   # seconds between API requests (increased for Vercel stability)
+API_REQUEST_DELAY = 0.2   # seconds between API requests on average; background balance warming stays within this rate
+API_REQUEST_BURST = 20    # API requests that may go out at once before API_REQUEST_DELAY paces warming
 API_CHUNK_SIZE = 50       # addresses per API request (reduced for Vercel)
 API_MAX_THREADS = 2       # maximum concurrent threads (reduced for Vercel)
 
+# Balance providers
+BALANCE_PROVIDERS = ('blockchain_info', 'esplora', 'snapshot')  # in order of preference; 'snapshot' is skipped until one exists
+BLOCKCHAIN_INFO_URL = 'https://blockchain.info/balance'
+ESPLORA_URL = 'https://blockstream.info/api'
+ESPLORA_MAX_CONCURRENT = 8    # per-address Esplora requests in flight for one chunk
+BALANCE_REQUEST_TIMEOUT = 30  # seconds before a provider call counts as failed
+ENABLE_HEDGING = True         # send a chunk to the next provider when the first one is slower than usual
+HEDGE_PERCENTILE = 0.95       # hedge once a call exceeds this percentile of the provider's recent latency
+HEDGE_DEFAULT_DELAY = 2.0     # seconds to wait before hedging until a provider has enough samples
+HEDGE_MIN_DELAY = 0.05        # never hedge sooner than this
+LATENCY_WINDOW = 200          # recent calls kept per provider for percentiles
+LATENCY_MIN_SAMPLES = 20      # samples needed before percentiles replace HEDGE_DEFAULT_DELAY
+BREAKER_FAILURE_THRESHOLD = 5 # consecutive failures before a provider is skipped
+BREAKER_RESET_TIMEOUT = 30    # seconds before a skipped provider gets one trial call
+
+# HTTP caching
+PAGE_CONTENT_VERSION = 3          # bump whenever the key page markup changes to invalidate cached copies
+KEY_PAGE_CACHE_MAX_AGE = 31536000 # seconds browsers/CDNs may keep a key page (content never changes)
+BALANCE_CACHE_TTL = 60            # seconds balance data stays fresh, server-side and over HTTP
+
+# Page cache and neighbor prefetching
+PAGE_CACHE_SIZE = 64         # generated pages kept in memory per process
+ENABLE_PREFETCH = True       # pre-generate neighboring pages in the background after serving a page
+PREFETCH_DISTANCE = 1        # pages on each side of the served page to prefetch
+PREFETCH_QUEUE_SIZE = 8      # pending prefetch jobs; the oldest are dropped first
+PREFETCH_WARM_BALANCES = True  # also warm the balance cache for prefetched pages
+PREFETCH_MAX_ACTIVE_REQUESTS = 0  # prefetch only while at most this many foreground requests are running
+
+# Shared cache (one memory-mapped file per host, used by every worker process)
+ENABLE_SHARED_CACHE = True
+SHARED_CACHE_PATH = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                                 'all-bitcoin-keys-cache.bin')
+SHARED_CACHE_SIZE_MB = 64          # host-wide budget for shared pages and balances
+SHARED_CACHE_PAGE_FRACTION = 0.75  # share of the budget for page slots (~46 KB each); the rest holds balances
+
+# Key derivation
+POINT_CHECKPOINT_SIZE = 128  # curve points remembered at page boundaries (a few hundred bytes each)
+POINT_CHECKPOINT_PAGES = 4   # start a page from a checkpoint up to this many pages away
+DERIVE_TAPROOT_ADDRESSES = False # show P2TR on key pages; one extra multiplication per key (~7x page generation cost). Search and scans derive it when needed
+USE_GENERATOR_TABLE = True   # multiply G with the precomputed, memory-mapped table
+GENERATOR_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'generator_table.bin')
+
+# Local balance snapshot
+BALANCE_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'balances.sqlite')
+
+# Range totals
+RANGE_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'range_index.bin')
+RANGE_INDEX_BLOCK_PAGES = 1    # pages per index block; range totals are rounded out to whole blocks
+
+# Bulk export
+EXPORT_MAX_PAGES = 200         # pages one /api/export request may stream (x500 keys = the whole heavy-lane key budget)
+EXPORT_BUFFER_BYTES = 4 * 1024 * 1024  # bytes gathered before each write
+
+# Distributed scanning
+SCAN_LEASE_PAGES = 20          # pages per lease handed to a worker
+SCAN_LEASE_TTL = 60            # seconds a worker may hold a lease without a heartbeat
+SCAN_COORDINATOR_HOST = '127.0.0.1'
+SCAN_COORDINATOR_PORT = 5100
+
+# Admission control (expensive routes get their own lane so they cannot starve page browsing)
+ENABLE_ADMISSION_CONTROL = True
+BROWSE_MAX_CONCURRENT = 16     # key pages, balances and other cheap routes running at once
+BROWSE_QUEUE_SIZE = 32
+HEAVY_MAX_CONCURRENT = 2       # /search, /balance-scan, /api/batch-search and /api/export running at once
+HEAVY_MAX_KEYS_IN_FLIGHT = 100000  # summed cost (pages x keys per page) of running heavy requests
+HEAVY_QUEUE_SIZE = 4           # heavy requests waiting beyond this are answered 503 right away
+ADMISSION_QUEUE_TIMEOUT = 5    # seconds a queued request waits before it is shed
+
+# Startup
+STARTUP_IMPORT_BUDGET = 0.5  # seconds a cold `import app` may take (checked by startup_report.py and tests)
+
 # Bitcoin configuration
 BITCOIN_MAX_NUMBER = 0xfffffffffffffffffffffffffffffffebaaedce6af48a03bbfd25e8cd0364140
 
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Load-test the Flask app against a local mock blockchain.info API
+
+Usage:
+    python load_test.py --duration 30 --concurrency 8
+    python load_test.py --mix home=60,balances=20,random=5,search=10,balance-scan=5
+    python load_test.py --mock-latency 0.3 --mock-rate-limit 5 --mock-error-rate 0.05
+    python load_test.py --sweep API_MAX_THREADS=1,2,4 --sweep API_CHUNK_SIZE=25,50,100
+
+Each configuration runs the real app in its own server process, with
+config.py values overridden by --set/--sweep and balance lookups pointed
+at a mock API served from this process. Closed-loop client threads pick
+routes by weight for --duration seconds; the report gives throughput and
+p50/p95/p99 latency per route, and sweeps end with a comparison table.
+"""
+
+import argparse
+import ast
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.request import urlopen
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Nothing from services/ is imported at module level: the server process has
+# to patch config before any module binds its settings
+ROUTES = ('home', 'balances', 'random', 'search', 'balance-scan')
+DEFAULT_MIX = 'home=60,balances=20,random=5,search=10,balance-scan=5'
+SEARCH_ADDRESS = '1BoatSLRHtKNngkdXEeobR76b53LETtpyT'  # never in the swept range, so every search runs to the end
+
+def parse_value(text):
+    """Python literal if it parses as one (numbers, tuples, booleans), otherwise the string itself"""
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+def parse_assignments(items):
+    overrides = {}
+    for item in items:
+        name, _, value = item.partition('=')
+        overrides[name.strip()] = parse_value(value.strip())
+    return overrides
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        route, _, weight = part.partition('=')
+        if route not in ROUTES:
+            raise SystemExit(f"Unknown route {route!r}; choose from {', '.join(ROUTES)}")
+        mix[route] = float(weight or 1)
+    return mix
+
+def route_path(route, rng, args):
+    """A request path for one route, spread over --page-range pages"""
+    page = rng.randint(1, args.page_range)
+    if route == 'home':
+        return f"/home?page={page}"
+    if route == 'balances':
+        return f"/api/balances?page={page}"
+    if route == 'random':
+        return "/random"
+    if route == 'search':
+        return f"/search?address={SEARCH_ADDRESS}&start_page={page}"
+    return f"/balance-scan?start_page={page}&max_pages={args.scan_pages}"
+
+# Server side
+
+def serve(overrides):
+    """Apply config overrides, then run the app on a free port until stdin closes"""
+    import config
+    for name, value in overrides.items():
+        if not hasattr(config, name):
+            raise SystemExit(f"config.py has no setting {name}")
+        setattr(config, name, value)
+
+    from werkzeug.serving import make_server
+    import app as app_module
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"READY {server.server_port}", flush=True)
+    sys.stdout = open(os.devnull, 'w')  # nobody reads the pipe from here on
+    sys.stdin.read()
+    server.shutdown()
+
+def start_server(overrides):
+    """Start a server process and return (process, base_url)"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', json.dumps(overrides)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    line = process.stdout.readline()
+    if not line.startswith('READY'):
+        process.kill()
+        raise RuntimeError(f"App server failed to start: {line.strip() or 'no output'}")
+    return process, f"http://127.0.0.1:{line.split()[1]}"
+
+def stop_server(process):
+    process.stdin.close()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+# Client side
+
+def run_load(base_url, mix, concurrency, duration, args, seed=0):
+    """Closed-loop load over the route mix; returns per-route stats"""
+    import requests
+    from services.balance_providers import LatencyTracker
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    latencies = {route: LatencyTracker(window=1000000) for route in routes}
+    counts = {route: {'requests': 0, 'errors': 0, 'shed': 0} for route in routes}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            route = rng.choices(routes, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = session.get(base_url + route_path(route, rng, args), allow_redirects=False,
+                                     timeout=args.timeout).status_code
+            except requests.exceptions.RequestException:
+                status = None
+            elapsed = time.perf_counter() - start
+            with lock:
+                counts[route]['requests'] += 1
+                if status == 503:
+                    counts[route]['shed'] += 1
+                elif status is None or status >= 400:
+                    counts[route]['errors'] += 1
+                else:
+                    latencies[route].record(elapsed)
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    results = {}
+    for route in routes:
+        summary = latencies[route].summary()
+        results[route] = dict(counts[route], ok=summary['samples'], rps=round(summary['samples'] / elapsed, 2),
+                              p50_ms=summary['p50_ms'], p95_ms=summary['p95_ms'], p99_ms=summary['p99_ms'])
+    return results
+
+def run_configuration(overrides, args):
+    """One load run against a fresh server and a fresh mock API"""
+    from services.mock_balance_server import MockBalanceServer
+    mock = MockBalanceServer(latency=args.mock_latency, error_rate=args.mock_error_rate,
+                             rate_limit=args.mock_rate_limit or None, burst=args.mock_burst, seed=1).start()
+    with tempfile.TemporaryDirectory() as directory:
+        settings = {
+            'BALANCE_PROVIDERS': ('blockchain_info',),
+            'BLOCKCHAIN_INFO_URL': mock.blockchain_info_url,
+            'SHARED_CACHE_PATH': os.path.join(directory, 'cache.bin'),
+            'FLASK_DEBUG': False
+        }
+        settings.update(overrides)
+        process, base_url = start_server(settings)
+        try:
+            routes = run_load(base_url, parse_mix(args.mix), args.concurrency, args.duration, args)
+            # Chunks the app gave up on (rate limited or failed) were shown as zero balances
+            balance_stats = json.loads(urlopen(base_url + '/api/balance-stats', timeout=10).read())
+        finally:
+            stop_server(process)
+            mock.stop()
+    return {'routes': routes, 'failed_chunks': balance_stats.get('failed_chunks', 0),
+            'upstream_requests': mock.requests, 'upstream_rate_limited': mock.rate_limited,
+            'upstream_errors': mock.errors}
+
+def print_report(result):
+    print(f"{'route':<14} {'requests':>8} {'ok/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'shed':>5}")
+    for route, stats in result['routes'].items():
+        print(f"{route:<14} {stats['requests']:>8} {stats['rps']:>7} {fmt(stats['p50_ms']):>8} {fmt(stats['p95_ms']):>8} "
+              f"{fmt(stats['p99_ms']):>8} {stats['errors']:>7} {stats['shed']:>5}")
+    print(f"Upstream: {result['upstream_requests']} requests, {result['upstream_rate_limited']} rate limited, "
+          f"{result['upstream_errors']} injected errors; {result['failed_chunks']} balance chunks failed")
+
+def print_comparison(rows, names, routes):
+    headers = names + ['ok/s'] + [f"{route} p99" for route in routes] + ['errors', 'shed', '429s', 'failed chunks']
+    table = []
+    for overrides, result in rows:
+        stats = result['routes'].values()
+        table.append([str(overrides[name]) for name in names] +
+                     [f"{sum(s['rps'] for s in stats):.1f}"] +
+                     [fmt(result['routes'][route]['p99_ms']) for route in routes] +
+                     [str(sum(s['errors'] for s in stats)), str(sum(s['shed'] for s in stats)),
+                      str(result['upstream_rate_limited']), str(result['failed_chunks'])])
+    widths = [max(len(header), *(len(row[i]) for row in table)) for i, header in enumerate(headers)]
+    print('  '.join(header.rjust(width) for header, width in zip(headers, widths)))
+    for row in table:
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
+
+def fmt(value):
+    return '-' if value is None else f"{value:.0f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the app against a mock balance API")
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    parser.add_argument('--duration', type=float, default=20, help="seconds of load per configuration")
+    parser.add_argument('--concurrency', type=int, default=8, help="client threads")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"route=weight list (default: {DEFAULT_MIX})")
+    parser.add_argument('--page-range', type=int, default=1000, help="pages requests are spread over")
+    parser.add_argument('--scan-pages', type=int, default=2, help="pages per /balance-scan request")
+    parser.add_argument('--timeout', type=float, default=60, help="client timeout per request")
+    parser.add_argument('--mock-latency', type=float, default=0.2, help="mock API response time in seconds")
+    parser.add_argument('--mock-error-rate', type=float, default=0.0, help="fraction of mock API 500s")
+    parser.add_argument('--mock-rate-limit', type=float, default=0, help="mock API requests per second (0: unlimited)")
+    parser.add_argument('--mock-burst', type=int, default=5, help="requests allowed above the rate limit at once")
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help="override a config.py setting for every run")
+    parser.add_argument('--sweep', action='append', default=[], metavar='NAME=V1,V2',
+                        help="run once per value (several --sweep options run every combination)")
+    parser.add_argument('--json', action='store_true', help="print raw results as JSON")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(json.loads(args.serve))
+        return
+
+    base = parse_assignments(args.set)
+    sweeps = {}
+    for item in args.sweep:
+        name, _, values = item.partition('=')
+        sweeps[name.strip()] = [parse_value(value.strip()) for value in values.split(',')]
+    names = list(sweeps)
+    routes = list(parse_mix(args.mix))
+
+    rows = []
+    for values in itertools.product(*sweeps.values()):
+        overrides = dict(base, **dict(zip(names, values)))
+        label = ', '.join(f"{name}={value}" for name, value in overrides.items()) or 'defaults'
+        print(f"Running {label} for {args.duration:g}s with {args.concurrency} clients...", file=sys.stderr)
+        result = run_configuration(overrides, args)
+        rows.append((overrides, result))
+        if not args.json and not names:
+            print_report(result)
+
+    if args.json:
+        print(json.dumps([{'settings': overrides, **result} for overrides, result in rows], indent=2, default=str))
+    elif names:
+        print_comparison(rows, names, routes)
+
+if __name__ == "__main__":
+    main()
@@ -12,3 +12,6 @@ class AllKey:
     address_compressed: str = ""
     address_compressed_balance: Optional[int] = None
     address_compressed_received: Optional[int] = None
+    address_p2wpkh: str = ""
+    address_p2sh_p2wpkh: str = ""
+    address_p2tr: str = ""
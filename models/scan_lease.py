@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass
+class ScanLease:
+    """Data class representing a range of pages handed to one scan worker"""
+    lease_id: int
+    start_page: int
+    pages: int
+    worker_id: Optional[str] = None
+    deadline: float = 0.0
+    attempts: int = 0
+    completed: bool = False
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Distributed balance scan: one coordinator hands out page leases to workers
+
+Usage:
+    python scan_cluster.py coordinator --start-page 1 --pages 10000 --port 5100
+    python scan_cluster.py worker --coordinator http://10.0.0.5:5100
+    python scan_cluster.py local --workers 4 --start-page 1 --pages 1000
+
+Workers look balances up in their own local snapshot (see snapshot_tool.py),
+so the only network traffic is lease bookkeeping with the coordinator.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.scan_cluster import ScanCoordinator, ScanWorker, make_coordinator_server
+from config import (ADDRESSES_PER_PAGE, BALANCE_SNAPSHOT_PATH, BITCOIN_MAX_NUMBER, SCAN_LEASE_PAGES, SCAN_LEASE_TTL,
+                    SCAN_COORDINATOR_HOST, SCAN_COORDINATOR_PORT)
+
+def serve_until_done(coordinator, server, progress_every=5.0, release_grace=10.0):
+    """Run the coordinator server in the background and print progress until the scan finishes
+
+    After the last lease is reported the server keeps answering until every
+    worker has been told there is nothing left (or the grace period ends,
+    for workers that died), so no worker is left waiting on a closed socket.
+    """
+    thread = threading.Thread(target=server.serve_forever, name="ScanCoordinator", daemon=True)
+    thread.start()
+    last_report = 0.0
+    while not coordinator.done:
+        time.sleep(0.1)
+        if time.monotonic() - last_report > progress_every:
+            status = coordinator.status()
+            print(f"  {status['pages_done']}/{status['pages_total']} pages, {status['hits']} hits, "
+                  f"{status['workers']} workers, {status['keys_per_second']:,} keys/s")
+            last_report = time.monotonic()
+    deadline = time.monotonic() + release_grace
+    while not coordinator.all_workers_released and time.monotonic() < deadline:
+        time.sleep(0.1)
+    server.shutdown()
+    server.server_close()
+
+def print_summary(coordinator):
+    status = coordinator.status()
+    for hit in coordinator.hits:
+        print(json.dumps(hit))
+    print(f"✓ Scanned {status['pages_done']} pages ({status['keys_scanned']:,} keys) in {status['elapsed']:.2f}s "
+          f"with {status['workers']} workers: {status['keys_per_second']:,} keys/s, {status['hits']} hits, "
+          f"{status['reassigned_leases']} leases reassigned")
+
+def run_coordinator(args):
+    coordinator = ScanCoordinator(args.start_page, args.pages, args.lease_pages, args.lease_ttl)
+    server = make_coordinator_server(coordinator, args.host, args.port)
+    print(f"Coordinator listening on http://{args.host}:{server.server_address[1]} "
+          f"for pages {args.start_page} to {coordinator.end_page}")
+    serve_until_done(coordinator, server)
+    print_summary(coordinator)
+
+def run_worker(args):
+    from services.balance_snapshot import BalanceSnapshot
+    snapshot = BalanceSnapshot(args.snapshot)
+    if not snapshot.exists():
+        raise SystemExit(f"No balance snapshot at {args.snapshot}; import one with snapshot_tool.py")
+    worker = ScanWorker(args.coordinator, snapshot)
+    worker.run()
+    print(f"Worker {worker.worker_id} finished {worker.leases_done} leases")
+
+def run_local(args):
+    """Coordinator plus N local worker processes on this machine"""
+    if not os.path.exists(args.snapshot):
+        raise SystemExit(f"No balance snapshot at {args.snapshot}; import one with snapshot_tool.py")
+    coordinator = ScanCoordinator(args.start_page, args.pages, args.lease_pages, args.lease_ttl)
+    server = make_coordinator_server(coordinator, '127.0.0.1', 0)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Scanning pages {args.start_page} to {coordinator.end_page} with {args.workers} local workers...")
+
+    workers = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), 'worker',
+                          '--coordinator', url, '--snapshot', args.snapshot],
+                         stdout=subprocess.DEVNULL)
+        for _ in range(args.workers)
+    ]
+    try:
+        serve_until_done(coordinator, server)
+    finally:
+        for worker in workers:
+            worker.wait(timeout=30)
+    print_summary(coordinator)
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed balance scan over a page range")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_range_arguments(command):
+        command.add_argument('--start-page', type=int, default=1)
+        command.add_argument('--pages', type=int, required=True)
+        command.add_argument('--lease-pages', type=int, default=SCAN_LEASE_PAGES)
+        command.add_argument('--lease-ttl', type=float, default=SCAN_LEASE_TTL)
+
+    coordinator = commands.add_parser('coordinator', help="serve leases for a page range")
+    add_range_arguments(coordinator)
+    coordinator.add_argument('--host', default=SCAN_COORDINATOR_HOST)
+    coordinator.add_argument('--port', type=int, default=SCAN_COORDINATOR_PORT)
+
+    worker = commands.add_parser('worker', help="claim and scan leases from a coordinator")
+    worker.add_argument('--coordinator', default=f"http://{SCAN_COORDINATOR_HOST}:{SCAN_COORDINATOR_PORT}")
+    worker.add_argument('--snapshot', default=BALANCE_SNAPSHOT_PATH)
+
+    local = commands.add_parser('local', help="coordinator and worker processes on this machine")
+    add_range_arguments(local)
+    local.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    local.add_argument('--snapshot', default=BALANCE_SNAPSHOT_PATH)
+
+    args = parser.parse_args()
+    if args.command != 'worker':
+        max_page = BITCOIN_MAX_NUMBER // ADDRESSES_PER_PAGE
+        if args.start_page < 1 or args.pages < 1 or args.start_page + args.pages - 1 > max_page:
+            raise SystemExit(f"Pages must lie within 1-{max_page}")
+    {'coordinator': run_coordinator, 'worker': run_worker, 'local': run_local}[args.command](args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Address encoders shared by page generation, search and export
+
+Bech32 (BIP173) and bech32m (BIP350) checksums run over the human-readable
+part and witness version before the program. That prefix is the same for
+every address of a given type, so SegwitEncoder folds it into the checksum
+state once and only processes the program for each address.
+"""
+
+import hashlib
+from typing import Optional, Tuple
+import base58
+
+CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+CHARSET_REV = {char: index for index, char in enumerate(CHARSET)}
+BECH32_CONST = 1
+BECH32M_CONST = 0x2bc830a3
+GENERATORS = (0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)
+
+def _polymod_step(chk, value):
+    top = chk >> 25
+    chk = (chk & 0x1ffffff) << 5 ^ value
+    for i in range(5):
+        if (top >> i) & 1:
+            chk ^= GENERATORS[i]
+    return chk
+
+def _polymod(values, chk=1):
+    for value in values:
+        chk = _polymod_step(chk, value)
+    return chk
+
+def _hrp_expand(hrp):
+    return [ord(char) >> 5 for char in hrp] + [0] + [ord(char) & 31 for char in hrp]
+
+def convert_bits(data, from_bits, to_bits, pad=True):
+    """Regroup a sequence of from_bits-wide values into to_bits-wide values"""
+    acc = 0
+    bits = 0
+    result = []
+    maxv = (1 << to_bits) - 1
+    for value in data:
+        if value < 0 or value >> from_bits:
+            return None
+        acc = (acc << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            result.append((acc >> bits) & maxv)
+    if pad:
+        if bits:
+            result.append((acc << (to_bits - bits)) & maxv)
+    elif bits >= from_bits or ((acc << (to_bits - bits)) & maxv):
+        return None
+    return result
+
+class SegwitEncoder:
+    """Encoder for one (hrp, witness version) pair with the shared prefix precomputed"""
+
+    def __init__(self, hrp: str = 'bc', witness_version: int = 0):
+        self.hrp = hrp
+        self.witness_version = witness_version
+        self.const = BECH32_CONST if witness_version == 0 else BECH32M_CONST
+        self._prefix_state = _polymod(_hrp_expand(hrp) + [witness_version])
+        self._prefix = hrp + '1' + CHARSET[witness_version]
+
+    def encode(self, program: bytes) -> str:
+        """Encode a witness program as an address"""
+        data = convert_bits(program, 8, 5)
+        chk = _polymod(data, self._prefix_state)
+        chk = _polymod((0, 0, 0, 0, 0, 0), chk) ^ self.const
+        checksum = [(chk >> 5 * (5 - i)) & 31 for i in range(6)]
+        return self._prefix + ''.join(CHARSET[value] for value in data + checksum)
+
+    def encode_batch(self, programs) -> list[str]:
+        """Encode many witness programs"""
+        encode = self.encode
+        return [encode(program) for program in programs]
+
+def decode_segwit_address(address: str, hrp: str = 'bc') -> Optional[Tuple[int, bytes]]:
+    """Decode a segwit address to (witness_version, program), or None if invalid"""
+    if address.lower() != address and address.upper() != address:
+        return None
+    address = address.lower()
+    separator = address.rfind('1')
+    if separator < 1 or separator + 7 > len(address) or len(address) > 90 or address[:separator] != hrp:
+        return None
+    try:
+        data = [CHARSET_REV[char] for char in address[separator + 1:]]
+    except KeyError:
+        return None
+    if not data:
+        return None
+    witness_version = data[0]
+    const = _polymod(_hrp_expand(hrp) + data)
+    if witness_version > 16 or const != (BECH32_CONST if witness_version == 0 else BECH32M_CONST):
+        return None
+    program = convert_bits(data[1:-6], 5, 8, False)
+    if program is None or not 2 <= len(program) <= 40:
+        return None
+    if witness_version == 0 and len(program) not in (20, 32):
+        return None
+    return witness_version, bytes(program)
+
+_TAP_TWEAK_PREFIX = hashlib.sha256(b'TapTweak').digest() * 2
+
+def taptweak_scalar(x_only: bytes) -> int:
+    """BIP341 key-path tweak for an internal key with no script tree (BIP86)"""
+    return int.from_bytes(hashlib.sha256(_TAP_TWEAK_PREFIX + x_only).digest(), 'big')
+
+# Output kinds an address can decode to, keyed by the hash/program they carry
+ADDRESS_KINDS = ('p2pkh', 'p2sh', 'p2wpkh', 'p2tr')
+
+_P2WPKH_ENCODER = SegwitEncoder('bc', 0)
+_P2TR_ENCODER = SegwitEncoder('bc', 1)
+
+def decode_address(address: str) -> Optional[Tuple[str, bytes]]:
+    """Decode an address to (kind, hash), or None if it is not a supported type
+
+    kind is 'p2pkh' (hash160), 'p2sh' (script hash), 'p2wpkh' (hash160)
+    or 'p2tr' (x-only output key).
+    """
+    address = address.strip()
+    if address[:3].lower() == 'bc1':
+        decoded = decode_segwit_address(address)
+        if decoded is None:
+            return None
+        witness_version, program = decoded
+        if witness_version == 0 and len(program) == 20:
+            return 'p2wpkh', program
+        if witness_version == 1 and len(program) == 32:
+            return 'p2tr', program
+        return None
+
+    try:
+        payload = base58.b58decode_check(address)
+    except ValueError:
+        return None
+    if len(payload) != 21:
+        return None
+    if payload[0] == 0x00:
+        return 'p2pkh', payload[1:]
+    if payload[0] == 0x05:
+        return 'p2sh', payload[1:]
+    return None
+
+def encode_address(kind: str, program: bytes) -> str:
+    """Encode (kind, hash) back to its address"""
+    if kind == 'p2wpkh':
+        return _P2WPKH_ENCODER.encode(program)
+    if kind == 'p2tr':
+        return _P2TR_ENCODER.encode(program)
+    version = b'\x00' if kind == 'p2pkh' else b'\x05'
+    return base58.b58encode_check(version + program).decode('utf-8')
+
+def script_key(kind: str, program: bytes) -> bytes:
+    """Compact binary key for an output: one kind byte followed by the hash"""
+    return bytes((ADDRESS_KINDS.index(kind),)) + program
@@ -0,0 +1,120 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional
+from config import (BROWSE_MAX_CONCURRENT, BROWSE_QUEUE_SIZE, HEAVY_MAX_CONCURRENT, HEAVY_MAX_KEYS_IN_FLIGHT,
+                    HEAVY_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT)
+
+class Overloaded(Exception):
+    """Raised when a request is shed; retry_after is a hint in whole seconds"""
+
+    def __init__(self, lane: str, retry_after: int, reason: str):
+        super().__init__(f"{lane} lane {reason}")
+        self.lane = lane
+        self.retry_after = retry_after
+        self.reason = reason
+
+class AdmissionLane:
+    """Concurrency and cost limits with a bounded FIFO wait queue for one class of requests
+
+    A request runs when fewer than max_concurrent requests are running and
+    its estimated cost fits in what is left of max_cost (a request costlier
+    than the whole budget runs alone). Otherwise it waits in line, up to
+    queue_timeout seconds; when the line is full it is shed at once.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, queue_size: int, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+                 max_cost: Optional[int] = None, clock=time.monotonic):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.max_cost = max_cost
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._waiting = deque()
+        self.active = 0
+        self.cost_in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.avg_duration = 0.0  # moving average of request time, for Retry-After
+
+    def _fits(self, cost: int) -> bool:
+        if self.active >= self.max_concurrent:
+            return False
+        if self.max_cost is None or self.active == 0:
+            return True
+        return self.cost_in_flight + cost <= self.max_cost
+
+    def acquire(self, cost: int = 0) -> int:
+        """Block until the request may run and return the cost to pass to release(); raises Overloaded"""
+        if self.max_cost is not None:
+            cost = min(cost, self.max_cost)
+        with self._condition:
+            if not self._waiting and self._fits(cost):
+                return self._admit(cost)
+            if len(self._waiting) >= self.queue_size:
+                self.shed += 1
+                raise Overloaded(self.name, self._retry_after(), "queue is full")
+
+            ticket = object()
+            self._waiting.append(ticket)
+            deadline = self.clock() + self.queue_timeout
+            try:
+                while self._waiting[0] is not ticket or not self._fits(cost):
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        raise Overloaded(self.name, self._retry_after(), "wait timed out")
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+            return self._admit(cost)
+
+    def _admit(self, cost: int) -> int:
+        self.active += 1
+        self.cost_in_flight += cost
+        self.admitted += 1
+        return cost
+
+    def release(self, cost: int, duration: float):
+        with self._condition:
+            self.active -= 1
+            self.cost_in_flight -= cost
+            self.avg_duration = duration if self.avg_duration == 0 else 0.8 * self.avg_duration + 0.2 * duration
+            self._condition.notify_all()
+
+    def _retry_after(self) -> int:
+        """Seconds until the line ahead of a new request has likely drained (caller holds the lock)"""
+        rounds = (len(self._waiting) + self.active) / max(1, self.max_concurrent)
+        return max(1, math.ceil(rounds * self.avg_duration))
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                'active': self.active,
+                'max_concurrent': self.max_concurrent,
+                'cost_in_flight': self.cost_in_flight,
+                'max_cost': self.max_cost,
+                'queue_depth': len(self._waiting),
+                'queue_size': self.queue_size,
+                'admitted': self.admitted,
+                'shed': self.shed,
+                'timed_out': self.timed_out,
+                'avg_duration_ms': round(self.avg_duration * 1000, 1)
+            }
+
+class AdmissionController:
+    """The app's priority lanes: cheap page browsing and expensive key sweeps never share slots"""
+
+    def __init__(self):
+        self.lanes = {
+            'browse': AdmissionLane('browse', BROWSE_MAX_CONCURRENT, BROWSE_QUEUE_SIZE),
+            'heavy': AdmissionLane('heavy', HEAVY_MAX_CONCURRENT, HEAVY_QUEUE_SIZE, max_cost=HEAVY_MAX_KEYS_IN_FLIGHT)
+        }
+
+    def stats(self) -> dict:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
@@ -1,42 +1,253 @@
 import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import replace
 import ecdsa
 from ecdsa import SigningKey, SECP256k1
+from ecdsa.ellipticcurve import PointJacobi
 import base58
 from models.all_key import AllKey
+from services.generator_table import GeneratorTable
+from services.point_math import P as FIELD_P, sequential_affine_points, jacobian_add_affine, batch_inverse
+from services.address_encoding import SegwitEncoder, taptweak_scalar
+from config import (PAGE_CACHE_SIZE, POINT_CHECKPOINT_SIZE, POINT_CHECKPOINT_PAGES,
+                    USE_GENERATOR_TABLE, GENERATOR_TABLE_PATH, DERIVE_TAPROOT_ADDRESSES, BITCOIN_MAX_NUMBER)
 
 class AllKeyService:
     """Service for generating Bitcoin private keys and addresses"""
     
-    def __init__(self):
+    def __init__(self, shared_cache=None):
         self.curve = SECP256k1
+        self.shared_cache = shared_cache  # optional host-wide tier behind the per-process page cache
+        self.page_cache_size = PAGE_CACHE_SIZE
+        self._page_cache = OrderedDict()  # (page, limit_per_page) -> list[AllKey], LRU order
+        self._page_cache_lock = threading.Lock()
+        self.generator = SECP256k1.generator
+        self.checkpoint_size = POINT_CHECKPOINT_SIZE
+        self.checkpoint_pages = POINT_CHECKPOINT_PAGES
+        self._checkpoints = OrderedDict()  # key integer -> PointJacobi for key*G, LRU order
+        self._checkpoint_lock = threading.Lock()
+        self.generator_table = GeneratorTable(GENERATOR_TABLE_PATH) if USE_GENERATOR_TABLE else None
+        self.p2wpkh_encoder = SegwitEncoder('bc', 0)
+        self.p2tr_encoder = SegwitEncoder('bc', 1)
+        self.derive_taproot = DERIVE_TAPROOT_ADDRESSES
     
     def get_data(self, page: int, limit_per_page: int) -> list[AllKey]:
-        """Generate Bitcoin keys for a specific page"""
+        """Get Bitcoin keys for a specific page, from the page cache when possible"""
+        if page < 1:
+            raise ValueError(f"Pages start at 1, got {page}")
+        cache_key = (page, limit_per_page)
+        with self._page_cache_lock:
+            cached = self._page_cache.get(cache_key)
+            if cached is not None:
+                self._page_cache.move_to_end(cache_key)
+        
+        if cached is None:
+            cached = self._load_page(page, limit_per_page)
+            with self._page_cache_lock:
+                self._page_cache[cache_key] = cached
+                while len(self._page_cache) > self.page_cache_size:
+                    self._page_cache.popitem(last=False)
+        
+        # Callers fill in balances on the items, so hand out copies
+        return [replace(item) for item in cached]
+    
+    def is_cached(self, page: int, limit_per_page: int) -> bool:
+        """Check whether a page is already in the page cache"""
+        with self._page_cache_lock:
+            return (page, limit_per_page) in self._page_cache
+    
+    def iter_page_hashes(self, start_page: int, max_pages: int, limit_per_page: int, include_taproot: bool = False):
+        """Yield (page, first_key, rows) for a range of pages without building AllKey objects
+        
+        Each row holds, for one key: the uncompressed and compressed hash160
+        (P2PKH; the compressed one is also the P2WPKH program), the
+        P2SH-P2WPKH script hash and, if requested, the 32-byte P2TR program
+        (None otherwise). This skips address encoding and the page cache
+        entirely, which is what range sweeps like batch search want.
+        The range must end within the keyspace: keys past the group order
+        have no public key.
+        """
+        if start_page < 1:
+            raise ValueError(f"Pages start at 1, got {start_page}")
+        max_page = BITCOIN_MAX_NUMBER // limit_per_page
+        if start_page + max_pages - 1 > max_page:
+            raise ValueError(f"The last page is {max_page}, got pages {start_page} to {start_page + max_pages - 1}")
+        for page in range(start_page, start_page + max_pages):
+            first_key = (page - 1) * limit_per_page + 1
+            yield page, first_key, self._page_rows(first_key, limit_per_page, include_taproot)
+    
+    def _page_rows(self, first_key: int, count: int, include_taproot: bool) -> list[tuple]:
+        """Hash rows (see iter_page_hashes) for `count` keys starting at first_key"""
+        points = self._public_points(first_key, count, count)
+        taproot = self._taproot_programs(points) if include_taproot else [None] * len(points)
+        rows = []
+        for (x, y), taproot_program in zip(points, taproot):
+            hash160_uncompressed, hash160_compressed = self._point_hash160s(x, y)
+            rows.append((hash160_uncompressed, hash160_compressed,
+                         self._p2sh_p2wpkh_hash(hash160_compressed), taproot_program))
+        return rows
+    
+    def _load_page(self, page: int, limit_per_page: int) -> list[AllKey]:
+        """Build a page from the shared cache's hashes, deriving (and sharing) them on a miss
+        
+        Every address type is derived from the same public key and hash160,
+        so the EC work is done once per key, and only by one worker per host.
+        """
+        first_key = (page - 1) * limit_per_page + 1
+        rows = None
+        if self.shared_cache is not None:
+            rows = self.shared_cache.get_page(page, limit_per_page, need_taproot=self.derive_taproot)
+        if rows is None:
+            rows = self._page_rows(first_key, limit_per_page, self.derive_taproot)
+            if self.shared_cache is not None:
+                self.shared_cache.put_page(page, limit_per_page, rows)
+        return self._items_from_rows(first_key, rows)
+    
+    def _items_from_rows(self, first_key: int, rows: list[tuple]) -> list[AllKey]:
+        """Encode every address type from a page's hash rows"""
         items = []
+        p2wpkh_addresses = self.p2wpkh_encoder.encode_batch([row[1] for row in rows])
+        if self.derive_taproot and all(row[3] is not None for row in rows):
+            p2tr_addresses = self.p2tr_encoder.encode_batch([row[3] for row in rows])
+        else:
+            p2tr_addresses = [""] * len(rows)
         
-        for index in range(limit_per_page):
-            # Calculate the key ID for this position
-            key_id = (page - 1) * limit_per_page + index + 1
-            
+        for index, (hash160_uncompressed, hash160_compressed, script_hash, _) in enumerate(rows):
             # Convert to hex and pad to 64 characters (32 bytes)
-            id_hex = hex(key_id)[2:]  # Remove '0x' prefix
-            # Pad with zeros to make it 64 characters (32 bytes)
-            id_hex = id_hex.zfill(64)
+            id_hex = format(first_key + index, '064x')
             
-            # Generate addresses
-            address_uncompressed = self._get_address(id_hex, compressed=False)
-            address_compressed = self._get_address(id_hex, compressed=True)
+            # Generate addresses from the shared public key hashes
+            address_uncompressed = self._hash160_to_address(hash160_uncompressed)
+            address_compressed = self._hash160_to_address(hash160_compressed)
+            address_p2sh_p2wpkh = self._hash160_to_address(script_hash, b'\x05')
             private_key = self._get_private_key(id_hex)
             
             items.append(AllKey(
                 id=id_hex,
                 private_key=private_key,
                 address_uncompressed=address_uncompressed,
-                address_compressed=address_compressed
+                address_compressed=address_compressed,
+                address_p2wpkh=p2wpkh_addresses[index],
+                address_p2sh_p2wpkh=address_p2sh_p2wpkh,
+                address_p2tr=p2tr_addresses[index]
             ))
         
         return items
     
+    def _public_points(self, first_key: int, count: int, limit_per_page: int) -> list[tuple[int, int]]:
+        """Affine public key coordinates for `count` consecutive keys
+        
+        Only the first public key needs a scalar multiplication; every
+        following key is the previous point + G, and all points are converted
+        to affine with a single shared modular inversion.
+        """
+        first_point = self._start_point(first_key, limit_per_page).to_affine()
+        points, (x, y, z) = sequential_affine_points(first_point.x(), first_point.y(), count)
+        
+        # Remember both ends so pages on either side can start from here
+        self._remember_point(first_key, PointJacobi(self.curve.curve, first_point.x(), first_point.y(), 1, self.curve.order))
+        self._remember_point(first_key + count - 1, PointJacobi(self.curve.curve, x, y, z, self.curve.order))
+        return points
+    
+    @staticmethod
+    def _point_hash160s(x: int, y: int) -> tuple[bytes, bytes]:
+        """hash160 of the uncompressed and compressed serializations of a public key"""
+        x_bytes = x.to_bytes(32, 'big')
+        uncompressed = b'\x04' + x_bytes + y.to_bytes(32, 'big')
+        compressed = (b'\x03' if y & 1 else b'\x02') + x_bytes
+        return (hashlib.new('ripemd160', hashlib.sha256(uncompressed).digest()).digest(),
+                hashlib.new('ripemd160', hashlib.sha256(compressed).digest()).digest())
+    
+    @staticmethod
+    def _p2sh_p2wpkh_hash(hash160_compressed: bytes) -> bytes:
+        """Script hash of the P2WPKH redeem script (OP_0 <20-byte hash160>)"""
+        redeem_script = b'\x00\x14' + hash160_compressed
+        return hashlib.new('ripemd160', hashlib.sha256(redeem_script).digest()).digest()
+    
+    def _taproot_programs(self, points: list[tuple[int, int]]) -> list[bytes]:
+        """BIP86 key-path output keys (x-only) for a batch of public keys
+        
+        Each output key is P + t*G with a per-key tweak t, so this is the one
+        address type that costs an extra multiplication per key. All results
+        share a single modular inversion.
+        """
+        outputs = []
+        for x, y in points:
+            # The internal key is used with an even y coordinate
+            even_y = y if y % 2 == 0 else FIELD_P - y
+            tweak = taptweak_scalar(x.to_bytes(32, 'big')) % self.curve.order
+            tx, ty, tz = self._multiply_generator_jacobian(tweak)
+            outputs.append(jacobian_add_affine(tx, ty, tz, x, even_y))
+        
+        inverses = batch_inverse([z for _, _, z in outputs])
+        return [(x * z_inv * z_inv % FIELD_P).to_bytes(32, 'big') for (x, _, _), z_inv in zip(outputs, inverses)]
+    
+    def _start_point(self, key_id: int, limit_per_page: int):
+        """Get key_id*G, starting from a nearby checkpoint when one exists"""
+        max_distance = self.checkpoint_pages * limit_per_page
+        best_key = None
+        with self._checkpoint_lock:
+            for checkpoint_key in self._checkpoints:
+                distance = abs(key_id - checkpoint_key)
+                if distance <= max_distance and (best_key is None or distance < abs(key_id - best_key)):
+                    best_key = checkpoint_key
+            if best_key is not None:
+                self._checkpoints.move_to_end(best_key)
+                checkpoint = self._checkpoints[best_key]
+        
+        if best_key is None:
+            return self._multiply_generator(key_id)
+        
+        # A small offset only touches a couple of table windows, which is far
+        # cheaper than a fresh 256-bit multiplication
+        offset = key_id - best_key
+        if offset > 0:
+            return checkpoint + self._multiply_generator(offset)
+        if offset < 0:
+            return checkpoint + (-self._multiply_generator(-offset))
+        return checkpoint
+    
+    def _multiply_generator(self, scalar: int):
+        """Compute scalar*G, using the precomputed table when enabled"""
+        if self.generator_table is not None:
+            return self.generator_table.multiply(scalar)
+        return self.generator * scalar
+    
+    def _multiply_generator_jacobian(self, scalar: int) -> tuple[int, int, int]:
+        """Compute scalar*G as a plain (X, Y, Z) tuple"""
+        if self.generator_table is not None:
+            return self.generator_table.multiply_jacobian(scalar)
+        affine = (self.generator * scalar).to_affine()
+        return affine.x(), affine.y(), 1
+    
+    def _remember_point(self, key_id: int, point):
+        """Store a checkpoint, evicting the least recently used beyond the bound"""
+        with self._checkpoint_lock:
+            self._checkpoints[key_id] = point
+            self._checkpoints.move_to_end(key_id)
+            while len(self._checkpoints) > self.checkpoint_size:
+                self._checkpoints.popitem(last=False)
+    
+    def _public_key_to_address(self, public_key_bytes: bytes) -> str:
+        """Encode a serialized public key as a P2PKH address"""
+        # Hash the public key
+        sha256_hash = hashlib.sha256(public_key_bytes).digest()
+        ripemd160_hash = hashlib.new('ripemd160', sha256_hash).digest()
+        return self._hash160_to_address(ripemd160_hash)
+    
+    @staticmethod
+    def _hash160_to_address(ripemd160_hash: bytes, version: bytes = b'\x00') -> str:
+        """Encode a hash160 as a base58check address (0x00 for P2PKH, 0x05 for P2SH)"""
+        # Add version byte (0x00 for mainnet)
+        versioned_payload = version + ripemd160_hash
+        
+        # Calculate checksum
+        checksum = hashlib.sha256(hashlib.sha256(versioned_payload).digest()).digest()[:4]
+        
+        # Create final address
+        return base58.b58encode(versioned_payload + checksum).decode('utf-8')
+    
     def _get_address(self, key_hex: str, compressed: bool = True) -> str:
         """Generate Bitcoin address from private key"""
         try:
@@ -61,21 +272,7 @@ class AllKeyService:
                 # Uncompressed public key (65 bytes)
                 public_key_bytes = b'\x04' + public_key
             
-            # Hash the public key
-            sha256_hash = hashlib.sha256(public_key_bytes).digest()
-            ripemd160_hash = hashlib.new('ripemd160', sha256_hash).digest()
-            
-            # Add version byte (0x00 for mainnet)
-            versioned_payload = b'\x00' + ripemd160_hash
-            
-            # Calculate checksum
-            checksum = hashlib.sha256(hashlib.sha256(versioned_payload).digest()).digest()[:4]
-            
-            # Create final address
-            address_bytes = versioned_payload + checksum
-            address = base58.b58encode(address_bytes).decode('utf-8')
-            
-            return address
+            return self._public_key_to_address(public_key_bytes)
             
         except Exception as e:
             print(f"Error generating address: {e}")
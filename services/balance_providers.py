@@ -0,0 +1,248 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+from models.blockchain import Blockchain
+from config import (BLOCKCHAIN_INFO_URL, ESPLORA_URL, ESPLORA_MAX_CONCURRENT, BALANCE_SNAPSHOT_PATH, LATENCY_WINDOW,
+                    LATENCY_MIN_SAMPLES, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+
+class LatencyTracker:
+    """Sliding window of recent call durations with percentile queries"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile (q in 0..1) of the window, or None when empty"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = min(len(samples) - 1, max(0, int(q * len(samples) + 0.5) - 1))
+        return samples[rank]
+
+    def summary(self) -> dict:
+        """p50/p95/p99 in milliseconds plus the sample count"""
+        def ms(q):
+            value = self.percentile(q)
+            return None if value is None else round(value * 1000, 1)
+        return {'samples': self.count(), 'p50_ms': ms(0.50), 'p95_ms': ms(0.95), 'p99_ms': ms(0.99)}
+
+class CircuitBreaker:
+    """Skips a provider after repeated failures, then lets one trial call through
+
+    closed -> open after `failure_threshold` consecutive failures; once
+    `reset_timeout` has passed a single caller is allowed (half-open). Its
+    success closes the breaker again, its failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if self._trial_running or self.clock() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the trial slot when half-open)"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial_running and self.clock() - self._opened_at >= self.reset_timeout:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+                self._trial_running = False
+
+class BalanceProvider(ABC):
+    """One source of balance data; fetch() raises on any failure so callers can fail over"""
+
+    name = 'provider'
+
+    def __init__(self):
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker()
+        self.calls = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def fetch(self, addresses: List[str], timeout: float) -> Dict[str, Blockchain]:
+        """Balances for every address, within timeout seconds"""
+
+    def available(self) -> bool:
+        """Whether the provider can be used at all right now (independent of its breaker)"""
+        return True
+
+    def call(self, addresses: List[str], timeout: float) -> Dict[str, Blockchain]:
+        """fetch() with latency, failure and breaker bookkeeping"""
+        with self._lock:
+            self.calls += 1
+        start = time.perf_counter()
+        try:
+            balances = self.fetch(addresses, timeout)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            self.breaker.record_failure()
+            raise
+        self.latency.record(time.perf_counter() - start)
+        self.breaker.record_success()
+        return balances
+
+    def hedge_delay(self, percentile: float, default: float, minimum: float) -> float:
+        """How long to wait on this provider before asking the next one"""
+        if self.latency.count() < LATENCY_MIN_SAMPLES:
+            return default
+        return max(minimum, self.latency.percentile(percentile))
+
+    def stats(self) -> dict:
+        return dict(self.latency.summary(), name=self.name, calls=self.calls,
+                    failures=self.failures, breaker=self.breaker.state)
+
+class BlockchainInfoProvider(BalanceProvider):
+    """blockchain.info-style multi-address endpoint: GET <url>?active=a,b,c"""
+
+    name = 'blockchain_info'
+
+    def __init__(self, base_url: str = BLOCKCHAIN_INFO_URL):
+        super().__init__()
+        self.base_url = base_url
+        self._session = None
+
+    def fetch(self, addresses: List[str], timeout: float) -> Dict[str, Blockchain]:
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        response = self._session.get(self.base_url, params={'cors': 'true', 'active': ','.join(addresses)},
+                                     timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        balances = {}
+        for address in addresses:
+            balance_data = data.get(address, {})
+            balances[address] = Blockchain(
+                final_balance=balance_data.get('final_balance', 0),
+                n_tx=balance_data.get('n_tx', 0),
+                total_received=balance_data.get('total_received', 0)
+            )
+        return balances
+
+class EsploraProvider(BalanceProvider):
+    """Esplora-style per-address endpoint: GET <url>/address/<a>
+
+    One request per address, so a chunk goes out as up to max_concurrent
+    parallel requests that share the call's deadline; the first failure
+    fails the whole chunk. Confirmed and mempool stats are summed like
+    blockchain.info's final_balance.
+    """
+
+    name = 'esplora'
+
+    def __init__(self, base_url: str = ESPLORA_URL, max_concurrent: int = ESPLORA_MAX_CONCURRENT):
+        super().__init__()
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrent = max_concurrent
+        self._local = threading.local()  # one requests.Session per worker thread
+        self._executor = None
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+        return session
+
+    def _fetch_one(self, address: str, deadline: float) -> Blockchain:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"{self.name} deadline passed before {address} was sent")
+        response = self._session().get(f"{self.base_url}/address/{address}", timeout=remaining)
+        response.raise_for_status()
+        data = response.json()
+        funded = spent = n_tx = 0
+        for stats in (data.get('chain_stats', {}), data.get('mempool_stats', {})):
+            funded += stats.get('funded_txo_sum', 0)
+            spent += stats.get('spent_txo_sum', 0)
+            n_tx += stats.get('tx_count', 0)
+        return Blockchain(final_balance=funded - spent, n_tx=n_tx, total_received=funded)
+
+    def fetch(self, addresses: List[str], timeout: float) -> Dict[str, Blockchain]:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="Esplora")
+        deadline = time.monotonic() + timeout
+        futures = {self._executor.submit(self._fetch_one, address, deadline): address for address in addresses}
+        done, not_done = wait(futures, timeout=timeout, return_when=FIRST_EXCEPTION)
+        for future in not_done:
+            future.cancel()
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
+        if not_done:
+            raise TimeoutError(f"{self.name} did not answer {len(addresses)} addresses within {timeout}s")
+        return {futures[future]: future.result() for future in done}
+
+class SnapshotProvider(BalanceProvider):
+    """Local BalanceSnapshot; addresses missing from the snapshot have never been funded"""
+
+    name = 'snapshot'
+
+    def __init__(self, snapshot=None):
+        super().__init__()
+        if snapshot is None:
+            from services.balance_snapshot import BalanceSnapshot
+            snapshot = BalanceSnapshot(BALANCE_SNAPSHOT_PATH)
+        self.snapshot = snapshot
+
+    def available(self) -> bool:
+        return self.snapshot.exists()
+
+    def fetch(self, addresses: List[str], timeout: float) -> Dict[str, Blockchain]:
+        found = self.snapshot.get_balance(addresses)
+        return {address: found.get(address) or Blockchain(0, 0, 0) for address in addresses}
+
+PROVIDER_TYPES = {
+    'blockchain_info': BlockchainInfoProvider,
+    'esplora': EsploraProvider,
+    'snapshot': SnapshotProvider
+}
+
+def build_providers(names) -> List[BalanceProvider]:
+    """Providers for the configured names, in order of preference"""
+    return [PROVIDER_TYPES[name]() for name in names]
@@ -1,32 +1,63 @@
-import requests
 import time
 import threading
 import atexit
 import signal
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional
 from models.blockchain import Blockchain
-from config import API_REQUEST_DELAY, API_CHUNK_SIZE, API_MAX_THREADS
+from services.balance_providers import LatencyTracker, build_providers
+from config import (API_REQUEST_DELAY, API_REQUEST_BURST, API_CHUNK_SIZE, API_MAX_THREADS, BALANCE_CACHE_TTL, BALANCE_PROVIDERS,
+                    BALANCE_REQUEST_TIMEOUT, ENABLE_HEDGING, HEDGE_PERCENTILE, HEDGE_DEFAULT_DELAY, HEDGE_MIN_DELAY)
 
 class BalanceService:
-    """Service for fetching Bitcoin balance information from blockchain.info"""
+    """Service for fetching Bitcoin balance information from one or more providers
     
-    def __init__(self):
-        self.base_url = "https://blockchain.info/balance"
+    Each chunk goes to the first healthy provider. If that call runs past
+    the provider's recent p95 latency the chunk is also sent to the next
+    provider (a hedged request) and whichever answers first wins; failed
+    calls fail over immediately and repeated failures trip the provider's
+    circuit breaker.
+    
+    Upstream chunk requests are metered by a token bucket refilled at one
+    per request_delay seconds. Visitors' lookups always go ahead and draw
+    it down; background warming (warm()) only spends what they left over.
+    """
+    
+    def __init__(self, providers=None, hedge: bool = ENABLE_HEDGING, shared_cache=None):
+        self.providers = build_providers(BALANCE_PROVIDERS) if providers is None else providers
+        self.hedge = hedge
+        self.hedge_percentile = HEDGE_PERCENTILE
+        self.hedge_default_delay = HEDGE_DEFAULT_DELAY
+        self.hedge_min_delay = HEDGE_MIN_DELAY
+        self.request_timeout = BALANCE_REQUEST_TIMEOUT
         self.request_delay = API_REQUEST_DELAY
+        self.request_burst = API_REQUEST_BURST
+        self._budget = float(API_REQUEST_BURST)  # upstream chunk requests that may go out now
+        self._budget_refilled_at = time.monotonic()
         self.max_threads = API_MAX_THREADS
-        self._cache = {}  # Simple in-memory cache
+        self.cache_ttl = BALANCE_CACHE_TTL
+        self.shared_cache = shared_cache  # replaces the per-process cache when given
+        self._cache = {}  # address -> (fetched_at, Blockchain)
         self._cache_lock = threading.Lock()
-        self._executor = None
+        self._executor = None  # provider calls; losers of a hedge finish here in the background
+        self._executor_lock = threading.Lock()
         self._shutdown = False
+        self.page_latency = LatencyTracker()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failed_chunks = 0
+        self.warmups_skipped = 0
+        self._stats_lock = threading.Lock()
         
-        # Register cleanup handlers
+        # Register cleanup handlers (signals can only be hooked from the main
+        # thread, and the service may be created lazily inside a request)
         atexit.register(self._cleanup)
-        if hasattr(signal, 'SIGTERM'):
-            signal.signal(signal.SIGTERM, self._signal_handler)
-        if hasattr(signal, 'SIGINT'):
-            signal.signal(signal.SIGINT, self._signal_handler)
+        if threading.current_thread() is threading.main_thread():
+            if hasattr(signal, 'SIGTERM'):
+                signal.signal(signal.SIGTERM, self._signal_handler)
+            if hasattr(signal, 'SIGINT'):
+                signal.signal(signal.SIGINT, self._signal_handler)
     
     def _signal_handler(self, signum, frame):
         """Handle shutdown signals"""
@@ -43,21 +74,44 @@ class BalanceService:
                 except:
                     pass
     
-    def get_balance(self, addresses: List[str]) -> Dict[str, Blockchain]:
-        """Fetch balance information for multiple addresses using concurrent requests and caching"""
+    def get_balance(self, addresses: List[str], failed: Optional[List[str]] = None) -> Dict[str, Blockchain]:
+        """Fetch balance information for multiple addresses using concurrent requests and caching
+        
+        Addresses whose chunk no provider could answer come back as zero
+        placeholders that are never cached; pass a list as `failed` to
+        collect them.
+        """
         if not addresses:
             return {}
         
+        start = time.perf_counter()
+        try:
+            return self._get_balance(addresses, [] if failed is None else failed)
+        finally:
+            self.page_latency.record(time.perf_counter() - start)
+    
+    def warm(self, addresses: List[str]):
+        """Cache balances ahead of a visitor, skipped entirely when the upstream budget cannot cover it"""
+        if addresses:
+            self._get_balance(addresses, [], optional=True)
+    
+    def _get_balance(self, addresses: List[str], failed: List[str], optional: bool = False) -> Dict[str, Blockchain]:
         # Check cache first
         all_balances = {}
         uncached_addresses = []
         
-        with self._cache_lock:
-            for address in addresses:
-                if address in self._cache:
-                    all_balances[address] = self._cache[address]
-                else:
-                    uncached_addresses.append(address)
+        if self.shared_cache is not None:
+            all_balances = self.shared_cache.get_balances(addresses, self.cache_ttl)
+            uncached_addresses = [address for address in addresses if address not in all_balances]
+        else:
+            now = time.monotonic()
+            with self._cache_lock:
+                for address in addresses:
+                    entry = self._cache.get(address)
+                    if entry and now - entry[0] < self.cache_ttl:
+                        all_balances[address] = entry[1]
+                    else:
+                        uncached_addresses.append(address)
         
         # If all addresses are cached, return immediately
         if not uncached_addresses:
@@ -66,6 +120,9 @@ class BalanceService:
         # Fetch uncached addresses
         chunk_size = API_CHUNK_SIZE
         chunks = [uncached_addresses[i:i + chunk_size] for i in range(0, len(uncached_addresses), chunk_size)]
+        if not self._take_budget(len(chunks), optional):
+            self._count('warmups_skipped')
+            return all_balances
         
         # Use ThreadPoolExecutor for concurrent API requests
         try:
@@ -81,16 +138,11 @@ class BalanceService:
                     if self._shutdown:
                         break
                     try:
-                        chunk_balances = future.result()
-                        all_balances.update(chunk_balances)
-                        
-                        # Cache the results
-                        with self._cache_lock:
-                            self._cache.update(chunk_balances)
-                            
+                        self._collect(future_to_chunk[future], future.result(), all_balances, failed)
                     except Exception as e:
                         print(f"Error fetching balance chunk: {e}")
                         # Continue with other chunks even if one fails
+                        failed.extend(future_to_chunk[future])
         except Exception as e:
             print(f"Error in thread pool: {e}")
             # Fallback to sequential processing if threading fails
@@ -98,48 +150,139 @@ class BalanceService:
                 if self._shutdown:
                     break
                 try:
-                    chunk_balances = self._fetch_balance_chunk(chunk)
-                    all_balances.update(chunk_balances)
-                    with self._cache_lock:
-                        self._cache.update(chunk_balances)
+                    self._collect(chunk, self._fetch_balance_chunk(chunk), all_balances, failed)
                 except Exception as chunk_error:
                     print(f"Error in sequential fallback: {chunk_error}")
+                    failed.extend(chunk)
         
         return all_balances
     
-    def _fetch_balance_chunk(self, addresses: List[str]) -> Dict[str, Blockchain]:
-        """Fetch balance for a chunk of addresses"""
-        try:
-            # Prepare the request URL
-            addresses_str = ','.join(addresses)
-            url = f"{self.base_url}?cors=true&active={addresses_str}"
-            
-            # Make the request
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            # Parse the response
-            data = response.json()
+    def _take_budget(self, chunks: int, optional: bool) -> bool:
+        """Spend upstream requests from the token bucket; optional work only runs if the tokens are there"""
+        if self.request_delay <= 0:
+            return True
+        with self._stats_lock:
+            now = time.monotonic()
+            self._budget = min(self.request_burst,
+                               self._budget + (now - self._budget_refilled_at) / self.request_delay)
+            self._budget_refilled_at = now
+            if optional and self._budget < chunks:
+                return False
+            # Foreground bursts run the bucket into debt (bounded), which holds warming back for a while
+            self._budget = max(-self.request_burst, self._budget - chunks)
+            return True
+    
+    def _collect(self, chunk: List[str], chunk_balances: Optional[Dict[str, Blockchain]],
+                 all_balances: Dict[str, Blockchain], failed: List[str]):
+        """Add a chunk's result to the answer; only real answers are cached, failures read as zero"""
+        if chunk_balances is None:
+            all_balances.update((address, Blockchain(0, 0, 0)) for address in chunk)
+            failed.extend(chunk)
+            return
+        all_balances.update(chunk_balances)
+        self._store(chunk_balances)
+    
+    def _store(self, balances: Dict[str, Blockchain]):
+        """Cache freshly fetched balances with the current timestamp"""
+        if self.shared_cache is not None:
+            self.shared_cache.put_balances(balances)
+            return
+        fetched_at = time.monotonic()
+        with self._cache_lock:
+            for address, balance in balances.items():
+                self._cache[address] = (fetched_at, balance)
+    
+    def _provider_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                workers = max(1, self.max_threads * max(1, len(self.providers)) * 2)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="BalanceProvider")
+            return self._executor
+    
+    def _fetch_balance_chunk(self, addresses: List[str]) -> Optional[Dict[str, Blockchain]]:
+        """Fetch balance for a chunk of addresses, hedging and failing over across providers; None if all failed"""
+        candidates = iter(self.providers)
+        pending = {}  # future -> provider
+        hedged = set()  # futures launched as hedges rather than first calls or failovers
+        errors = []
+        executor = self._provider_executor()
+        
+        def launch():
+            """Send the chunk to the next usable provider; None when none is left"""
+            for provider in candidates:
+                if provider.available() and provider.breaker.allow():
+                    future = executor.submit(provider.call, addresses, self.request_timeout)
+                    pending[future] = provider
+                    return future
+            return None
+        
+        latest = launch()
+        launched_at = time.monotonic()
+        deadline = launched_at + self.request_timeout
+        exhausted = latest is None
+        while pending:
+            now = time.monotonic()
+            if self.hedge and not exhausted:
+                delay = pending[latest].hedge_delay(self.hedge_percentile, self.hedge_default_delay,
+                                                    self.hedge_min_delay)
+                hedge_at = launched_at + delay
+                timeout = max(0.0, min(hedge_at, deadline) - now)
+            else:
+                timeout = max(0.0, deadline - now)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
             
-            # Convert to our Blockchain objects
-            balances = {}
-            for address, balance_data in data.items():
-                balances[address] = Blockchain(
-                    final_balance=balance_data.get('final_balance', 0),
-                    n_tx=balance_data.get('n_tx', 0),
-                    total_received=balance_data.get('total_received', 0)
-                )
+            if not done:
+                if time.monotonic() >= deadline:
+                    break
+                # The latest call is slower than usual: hedge with the next provider
+                hedge = launch()
+                if hedge is None:
+                    exhausted = True
+                else:
+                    latest, launched_at = hedge, time.monotonic()
+                    hedged.add(hedge)
+                    self._count('hedges')
+                continue
             
-            return balances
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    balances = future.result()
+                except Exception as e:
+                    errors.append(f"{provider.name}: {e}")
+                    continue
+                if future in hedged:
+                    self._count('hedge_wins')
+                return balances
             
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching balance data: {e}")
-            print(f"URL attempted: {url}")
-            print(f"Addresses: {addresses[:3]}...")  # Show first 3 addresses
-            # Return empty balances for this chunk
-            return {address: Blockchain(0, 0, 0) for address in addresses}
-        except Exception as e:
-            print(f"Unexpected error: {e}")
-            print(f"URL attempted: {url}")
-            print(f"Addresses: {addresses[:3]}...")  # Show first 3 addresses
-            return {address: Blockchain(0, 0, 0) for address in addresses}
+            # Everything that finished failed; fail over without waiting for the hedge delay
+            if not exhausted:
+                failover = launch()
+                if failover is None:
+                    exhausted = True
+                else:
+                    latest, launched_at = failover, time.monotonic()
+        
+        self._count('failed_chunks')
+        if pending:
+            errors.append(f"no provider answered within {self.request_timeout}s")
+        elif not errors:
+            errors.append("no provider available")
+        print(f"Error fetching balance data: {'; '.join(errors)}")
+        print(f"Addresses: {addresses[:3]}...")  # Show first 3 addresses
+        return None
+    
+    def _count(self, counter: str):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def stats(self) -> dict:
+        """Per-provider latency and breaker state plus page-level latency"""
+        return {
+            'providers': [provider.stats() for provider in self.providers],
+            'page_latency': self.page_latency.summary(),
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'failed_chunks': self.failed_chunks,
+            'warmups_skipped': self.warmups_skipped
+        }
@@ -0,0 +1,242 @@
+import csv
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from models.blockchain import Blockchain
+from services.address_encoding import ADDRESS_KINDS, decode_address, script_key
+from config import BALANCE_SNAPSHOT_PATH
+
+class MissingBlock(Exception):
+    """Raised when a delta would skip a block the snapshot has not applied yet"""
+
+    def __init__(self, expected: int, height: int):
+        super().__init__(f"Block {expected} has not been applied; cannot apply block {height}")
+        self.expected = expected
+        self.height = height
+
+class BalanceSnapshot:
+    """Local balance store backed by SQLite
+
+    Rows are keyed by script_key (one kind byte + hash), so derived keys can
+    be looked up straight from their hash160 without encoding addresses.
+    The database runs in WAL mode: readers keep serving while a writer
+    commits.
+
+    After a full import the snapshot is kept current with per-block delta
+    files: CSVs of the new address,final_balance,n_tx,total_received for
+    every address a block touched, named after the block height
+    (`850123.csv`, optionally `850123-<block hash>.csv`). Each delta is
+    applied in one transaction together with its height. Heights at or
+    below the snapshot's are skipped, so re-applying a feed is a no-op, and
+    once the snapshot has a height each delta must be the very next block.
+    """
+
+    LOOKUP_BATCH = 900  # stay under SQLite's default bound-parameter limit
+    DELTA_NAME = re.compile(r'^(\d+)(?:-([0-9a-fA-F]+))?\.csv$')
+
+    def __init__(self, path: str = BALANCE_SNAPSHOT_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _connection(self, create: bool = False) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not shareable)
+
+        Only writers create the database; a lookup against a mistyped path
+        raises instead of quietly answering from a new, empty snapshot.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            if not create and not self.exists():
+                raise FileNotFoundError(f"No balance snapshot at {self.path}")
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS balances ("
+                " script BLOB PRIMARY KEY,"
+                " final_balance INTEGER NOT NULL,"
+                " n_tx INTEGER NOT NULL,"
+                " total_received INTEGER NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS blocks ("
+                " height INTEGER PRIMARY KEY,"
+                " block_hash TEXT,"
+                " addresses INTEGER NOT NULL,"
+                " applied_at REAL NOT NULL"
+                ")"
+            )
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Close this thread's connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    @staticmethod
+    def _records(rows: Iterable[List[str]]) -> tuple[list, int]:
+        """(script_key, final_balance, n_tx, total_received) records and the count of unusable rows"""
+        records = []
+        skipped = 0
+        for row in rows:
+            try:
+                address, final_balance, n_tx, total_received = row[:4]
+                decoded = decode_address(address)
+                record = (script_key(*decoded), int(final_balance), int(n_tx), int(total_received)) if decoded else None
+            except (ValueError, TypeError):
+                record = None
+            if record is None:
+                skipped += 1
+            else:
+                records.append(record)
+        return records, skipped
+
+    @staticmethod
+    def _read_csv(path: str) -> List[List[str]]:
+        with open(path, newline='') as f:
+            return [row for row in csv.reader(f) if row and row[0] != 'address']
+
+    def import_rows(self, rows: Iterable[List[str]], height: Optional[int] = None) -> tuple[int, int]:
+        """Insert or replace (address, final_balance, n_tx, total_received) rows in one transaction
+
+        Returns (imported, skipped); rows with undecodable addresses or
+        non-numeric fields are skipped. Pass the block height the rows are
+        current as of so later deltas apply on top of it.
+        """
+        records, skipped = self._records(rows)
+        connection = self._connection(create=True)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("INSERT OR REPLACE INTO balances VALUES (?, ?, ?, ?)", records)
+            if height is not None:
+                connection.execute("INSERT OR REPLACE INTO blocks VALUES (?, NULL, ?, ?)",
+                                   (height, len(records), time.time()))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return len(records), skipped
+
+    def import_csv(self, path: str, height: Optional[int] = None) -> tuple[int, int]:
+        """Import a CSV of address,final_balance,n_tx,total_received (header optional)"""
+        return self.import_rows(self._read_csv(path), height)
+
+    def height(self) -> Optional[int]:
+        """Height of the last block applied, or None if the snapshot has no block history (or does not exist yet)"""
+        if not self.exists():
+            return None
+        return self._connection().execute("SELECT MAX(height) FROM blocks").fetchone()[0]
+
+    def apply_delta(self, height: int, rows: Iterable[List[str]], block_hash: Optional[str] = None) -> Optional[tuple[int, int]]:
+        """Apply one block's address changes atomically; returns (updated, skipped), or None if already applied
+
+        Raises MissingBlock if the block does not directly follow the
+        snapshot's height. The height checks run inside the write
+        transaction, so concurrent appliers (several workers watching one
+        feed) apply each block once and in order.
+        """
+        records, skipped = self._records(rows)
+        connection = self._connection(create=True)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            current = connection.execute("SELECT MAX(height) FROM blocks").fetchone()[0]
+            if current is not None and height <= current:
+                connection.execute("ROLLBACK")
+                return None
+            if current is not None and height != current + 1:
+                raise MissingBlock(current + 1, height)
+            connection.executemany("INSERT OR REPLACE INTO balances VALUES (?, ?, ?, ?)", records)
+            connection.execute("INSERT INTO blocks VALUES (?, ?, ?, ?)", (height, block_hash, len(records), time.time()))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return len(records), skipped
+
+    def apply_delta_file(self, path: str, height: int, block_hash: Optional[str] = None) -> Optional[tuple[int, int]]:
+        """apply_delta() for a delta CSV"""
+        return self.apply_delta(height, self._read_csv(path), block_hash)
+
+    @classmethod
+    def delta_files(cls, directory: str) -> List[tuple[int, Optional[str], str]]:
+        """(height, block_hash, path) for the delta files in a directory, oldest block first"""
+        found = []
+        for name in os.listdir(directory):
+            match = cls.DELTA_NAME.match(name)
+            if match:
+                found.append((int(match.group(1)), match.group(2), os.path.join(directory, name)))
+        return sorted(found)
+
+    def apply_delta_directory(self, directory: str, on_applied=None) -> tuple[List[tuple[int, int, int]], Optional[int]]:
+        """Apply the deltas in a directory that follow the snapshot, in block order
+
+        Stops at the first missing block. Returns the (height, updated,
+        skipped) of each block applied and the missing height, or None when
+        the directory had no gap. on_applied(height, updated, skipped,
+        seconds) is called after each block.
+        """
+        current = self.height()
+        applied = []
+        for height, block_hash, path in self.delta_files(directory):
+            if current is not None and height <= current:
+                continue
+            if current is not None and height != current + 1:
+                return applied, current + 1
+            started = time.perf_counter()
+            result = self.apply_delta_file(path, height, block_hash)
+            current = height
+            if result is not None:
+                applied.append((height, *result))
+                if on_applied is not None:
+                    on_applied(height, *result, time.perf_counter() - started)
+        return applied, None
+
+    def lookup_scripts(self, keys: List[bytes]) -> Dict[bytes, Blockchain]:
+        """Balances for the script keys present in the snapshot"""
+        connection = self._connection()
+        found = {}
+        for start in range(0, len(keys), self.LOOKUP_BATCH):
+            batch = keys[start:start + self.LOOKUP_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            cursor = connection.execute(
+                f"SELECT script, final_balance, n_tx, total_received FROM balances WHERE script IN ({placeholders})",
+                batch
+            )
+            for script, final_balance, n_tx, total_received in cursor:
+                found[script] = Blockchain(final_balance=final_balance, n_tx=n_tx, total_received=total_received)
+        return found
+
+    def get_balance(self, addresses: List[str]) -> Dict[str, Blockchain]:
+        """Balances keyed by address, for the addresses present in the snapshot"""
+        keys = {}
+        for address in addresses:
+            decoded = decode_address(address)
+            if decoded:
+                keys[script_key(*decoded)] = address
+        found = self.lookup_scripts(list(keys))
+        return {keys[script]: balance for script, balance in found.items()}
+
+    def has_kind(self, kind: str) -> bool:
+        """Whether any output of this kind is in the snapshot (a primary-key range probe)"""
+        prefix = ADDRESS_KINDS.index(kind)
+        row = self._connection().execute(
+            "SELECT 1 FROM balances WHERE script >= ? AND script < ? LIMIT 1",
+            (bytes((prefix,)), bytes((prefix + 1,)))
+        ).fetchone()
+        return row is not None
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM balances").fetchone()[0]
@@ -0,0 +1,122 @@
+import mmap
+import os
+import threading
+from ecdsa import SECP256k1
+from ecdsa.ellipticcurve import PointJacobi
+from services.point_math import jacobian_add_affine
+
+class GeneratorTable:
+    """Precomputed fixed-base table for multiplying the secp256k1 generator
+
+    The scalar is split into 32 windows of 8 bits. Row i of the table holds
+    j * 2^(8i) * G for j = 1..255 as affine (x, y), so k*G is the sum of at
+    most 32 table entries: additions only, no doublings. The table is a
+    512 KB file mapped read-only, so every worker process on a host shares
+    the same physical pages.
+    """
+
+    MAGIC = b'SECPGT01'
+    WINDOW_BITS = 8
+    WINDOWS = 256 // WINDOW_BITS
+    ROW_SIZE = (1 << WINDOW_BITS) - 1
+    ENTRY_SIZE = 64
+
+    def __init__(self, path: str):
+        self.path = path
+        self.curve = SECP256k1.curve
+        self.order = SECP256k1.order
+        self._data = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def file_size(cls) -> int:
+        return len(cls.MAGIC) + cls.WINDOWS * cls.ROW_SIZE * cls.ENTRY_SIZE
+
+    def load(self):
+        """Map the table file, building it first if it is missing or invalid"""
+        with self._lock:
+            if self._data is not None:
+                return self
+            data = self._map_file()
+            if data is None:
+                table = self.build_bytes()
+                try:
+                    self._write_file(table)
+                    data = self._map_file()
+                except OSError as e:
+                    # Read-only filesystems (serverless) keep the table in process memory
+                    print(f"Could not save generator table to {self.path}: {e}")
+                if data is None:
+                    data = table
+            self._data = data
+            return self
+
+    def multiply(self, scalar: int) -> PointJacobi:
+        """Compute scalar*G using only table lookups and mixed additions"""
+        x, y, z = self.multiply_jacobian(scalar)
+        return PointJacobi(self.curve, x, y, z, self.order)
+
+    def multiply_jacobian(self, scalar: int) -> tuple[int, int, int]:
+        """Compute scalar*G as a plain (X, Y, Z) tuple for the point_math helpers"""
+        if self._data is None:
+            self.load()
+        scalar %= self.order
+        if scalar == 0:
+            return 0, 0, 0
+
+        data = self._data
+        base = len(self.MAGIC)
+        point = None
+        window = 0
+        while scalar:
+            digit = scalar & self.ROW_SIZE
+            scalar >>= self.WINDOW_BITS
+            if digit:
+                offset = base + (window * self.ROW_SIZE + digit - 1) * self.ENTRY_SIZE
+                x2 = int.from_bytes(data[offset:offset + 32], 'big')
+                y2 = int.from_bytes(data[offset + 32:offset + 64], 'big')
+                if point is None:
+                    point = (x2, y2, 1)
+                else:
+                    # Partial sums of distinct windows never coincide for 0 < k < n
+                    point = jacobian_add_affine(point[0], point[1], point[2], x2, y2)
+            window += 1
+        return point
+
+    def build_bytes(self) -> bytes:
+        """Compute the full table"""
+        out = bytearray(self.MAGIC)
+        row_base = SECP256k1.generator
+        for _ in range(self.WINDOWS):
+            point = row_base
+            for _ in range(self.ROW_SIZE):
+                affine = point.to_affine()
+                out += affine.x().to_bytes(32, 'big') + affine.y().to_bytes(32, 'big')
+                point = point + row_base
+            # point is now 256 * row_base, the base of the next window
+            row_base = point
+        return bytes(out)
+
+    def _map_file(self):
+        """Memory-map an existing, valid table file read-only"""
+        try:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size != self.file_size():
+                    return None
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError:
+            return None
+        if data[:len(self.MAGIC)] != self.MAGIC:
+            data.close()
+            return None
+        return data
+
+    def _write_file(self, table: bytes):
+        """Write the table atomically so concurrent workers never map a partial file"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(table)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,161 @@
+import struct
+import sys
+import time
+from array import array
+from typing import BinaryIO, Dict, Iterator
+from services.address_encoding import script_key
+from config import ADDRESSES_PER_PAGE, EXPORT_BUFFER_BYTES
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # optional: the raw format needs nothing beyond the standard library
+    pyarrow = None
+
+KEY_COLUMNS = (('key', 32), ('hash160_compressed', 20), ('hash160_uncompressed', 20))
+BALANCE_COLUMNS = ('compressed_balance', 'compressed_received', 'uncompressed_balance', 'uncompressed_received')
+
+class KeyExporter:
+    """Columnar binary export of key pages for bulk consumers
+
+    The raw format is a header (magic, flags, keys per batch, 32-byte
+    big-endian start page, batch count) followed by one batch per page: a uint32 key count, then
+    each column back to back with fixed-width values:
+
+    - key: 32-byte big-endian private key integer
+    - hash160_compressed, hash160_uncompressed: 20 bytes each
+    - with FLAG_BALANCES, four little-endian int64 columns from the local
+      snapshot: compressed_balance, compressed_received,
+      uncompressed_balance, uncompressed_received
+
+    Columns are joined straight from the hash rows of iter_page_hashes, so
+    no AllKey objects or addresses are built, and output leaves in chunks
+    of about buffer_bytes. With pyarrow installed the same columns can be
+    written as an Arrow IPC or Parquet file.
+    """
+
+    MAGIC = b'AKKEYS01'
+    HEADER = struct.Struct('<8sII32sQ')  # pages run to ~2**247, so the start page is stored like a key
+    BATCH_HEADER = struct.Struct('<I')
+    FLAG_BALANCES = 1
+
+    def __init__(self, all_key_service, snapshot=None, limit_per_page: int = ADDRESSES_PER_PAGE,
+                 buffer_bytes: int = EXPORT_BUFFER_BYTES):
+        self.all_key_service = all_key_service
+        self.snapshot = snapshot
+        self.limit_per_page = limit_per_page
+        self.buffer_bytes = buffer_bytes
+        self.keys_exported = 0
+        self.derive_seconds = 0.0
+
+    def iter_batches(self, start_page: int, pages: int) -> Iterator[Dict[str, bytes]]:
+        """Column buffers for each page, in page order"""
+        sweep = self.all_key_service.iter_page_hashes(start_page, pages, self.limit_per_page)
+        while True:
+            started = time.perf_counter()
+            batch = next(sweep, None)
+            self.derive_seconds += time.perf_counter() - started
+            if batch is None:
+                return
+            _, first_key, rows = batch
+            count = len(rows)
+            columns = {
+                'key': b''.join([key.to_bytes(32, 'big') for key in range(first_key, first_key + count)]),
+                'hash160_compressed': b''.join([row[1] for row in rows]),
+                'hash160_uncompressed': b''.join([row[0] for row in rows])
+            }
+            if self.snapshot is not None:
+                columns.update(self._balance_columns(rows))
+            self.keys_exported += count
+            yield columns
+
+    def _balance_columns(self, rows) -> Dict[str, bytes]:
+        """Snapshot balances of each key's P2PKH outputs; most keys have none, so columns start zeroed"""
+        count = len(rows)
+        positions = {}
+        for index, row in enumerate(rows):
+            positions[script_key('p2pkh', row[1])] = (index, 0)
+            positions[script_key('p2pkh', row[0])] = (index, 2)
+        values = [array('q', bytes(8 * count)) for _ in BALANCE_COLUMNS]
+        for script, balance in self.snapshot.lookup_scripts(list(positions)).items():
+            index, column = positions[script]
+            values[column][index] = balance.final_balance
+            values[column + 1][index] = balance.total_received
+        if sys.byteorder == 'big':
+            for column in values:
+                column.byteswap()
+        return {name: column.tobytes() for name, column in zip(BALANCE_COLUMNS, values)}
+
+    def iter_raw(self, start_page: int, pages: int) -> Iterator[bytes]:
+        """The raw format in chunks of at least buffer_bytes (the last one may be shorter)"""
+        flags = self.FLAG_BALANCES if self.snapshot is not None else 0
+        buffer = bytearray(self.HEADER.pack(self.MAGIC, flags, self.limit_per_page, start_page.to_bytes(32, 'big'), pages))
+        for columns in self.iter_batches(start_page, pages):
+            buffer += self.BATCH_HEADER.pack(len(columns['key']) // 32)
+            for data in columns.values():
+                buffer += data
+            if len(buffer) >= self.buffer_bytes:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+
+    def write_raw(self, f: BinaryIO, start_page: int, pages: int) -> int:
+        """Write the raw format to an open binary file; returns bytes written"""
+        written = 0
+        for chunk in self.iter_raw(start_page, pages):
+            f.write(chunk)
+            written += len(chunk)
+        return written
+
+    def write_arrow(self, path: str, start_page: int, pages: int, parquet: bool = False):
+        """Write an Arrow IPC file (or Parquet with parquet=True); requires pyarrow"""
+        if pyarrow is None:
+            raise RuntimeError("pyarrow is not installed; use the raw format or pip install pyarrow")
+        fields = [pyarrow.field(name, pyarrow.binary(width)) for name, width in KEY_COLUMNS]
+        if self.snapshot is not None:
+            fields += [pyarrow.field(name, pyarrow.int64()) for name in BALANCE_COLUMNS]
+        schema = pyarrow.schema(fields)
+        if parquet:
+            writer = pyarrow.parquet.ParquetWriter(path, schema)
+        else:
+            writer = pyarrow.ipc.new_file(path, schema)
+        try:
+            # Arrow arrays wrap the column buffers without copying; pages are
+            # grouped so Parquet row groups are not one page each
+            pending = []
+            pending_bytes = 0
+            for columns in self.iter_batches(start_page, pages):
+                count = len(columns['key']) // 32
+                arrays = [pyarrow.Array.from_buffers(field.type, count, [None, pyarrow.py_buffer(columns[field.name])])
+                          for field in fields]
+                pending.append(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+                pending_bytes += sum(len(data) for data in columns.values())
+                if pending_bytes >= self.buffer_bytes:
+                    writer.write_table(pyarrow.Table.from_batches(pending, schema))
+                    pending = []
+                    pending_bytes = 0
+            if pending:
+                writer.write_table(pyarrow.Table.from_batches(pending, schema))
+        finally:
+            writer.close()
+
+def read_raw(f: BinaryIO) -> Iterator[Dict[str, bytes]]:
+    """Column buffers for each batch of a raw export (the reference reader for the format)"""
+    magic, flags, _, _, batches = KeyExporter.HEADER.unpack(f.read(KeyExporter.HEADER.size))
+    if magic != KeyExporter.MAGIC:
+        raise ValueError("Not a key export file")
+    widths = list(KEY_COLUMNS)
+    if flags & KeyExporter.FLAG_BALANCES:
+        widths += [(name, 8) for name in BALANCE_COLUMNS]
+    for _ in range(batches):
+        count = KeyExporter.BATCH_HEADER.unpack(f.read(KeyExporter.BATCH_HEADER.size))[0]
+        yield {name: f.read(width * count) for name, width in widths}
+
+def balance_values(data: bytes) -> array:
+    """An int64 balance column as an array"""
+    values = array('q', data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
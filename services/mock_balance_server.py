@@ -0,0 +1,146 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+class MockBalanceServer:
+    """Local stand-in for a balance API, for tests and benchmarks
+
+    Serves both a blockchain.info-style `/balance?active=a,b` endpoint and
+    an Esplora-style `/address/<a>` endpoint from the same in-memory
+    balances. Every response waits `latency` seconds, a `slow_rate`
+    fraction waits `slow_latency` instead, and an `error_rate` fraction
+    answers 500. With `rate_limit` set, requests beyond that many per
+    second (after a burst of `burst`) get 429 straight away, like the
+    public APIs do.
+    """
+
+    def __init__(self, balances: Optional[Dict[str, Tuple[int, int, int]]] = None, latency: float = 0.0,
+                 slow_rate: float = 0.0, slow_latency: float = 1.0, error_rate: float = 0.0,
+                 rate_limit: Optional[float] = None, burst: int = 1,
+                 seed: Optional[int] = None, host: str = '127.0.0.1', port: int = 0):
+        self.balances = balances or {}  # address -> (final_balance, n_tx, total_received)
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def blockchain_info_url(self) -> str:
+        return f"{self.url}/balance"
+
+    def start(self) -> 'MockBalanceServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MockBalanceServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _take_token(self) -> bool:
+        """Token bucket check for the rate limit (caller holds the lock)"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_limit)
+        self._refilled_at = now
+        if self._tokens < 1:
+            self.rate_limited += 1
+            return False
+        self._tokens -= 1
+        return True
+
+    def _next_response(self) -> Tuple[float, bool]:
+        """(delay, fail) for the next request; delay is None when it is rate limited"""
+        with self._lock:
+            self.requests += 1
+            if self.rate_limit and not self._take_token():
+                return None, False
+            slow = self._random.random() < self.slow_rate
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return (self.slow_latency if slow else self.latency), fail
+
+    def _balance(self, address: str) -> Tuple[int, int, int]:
+        return self.balances.get(address, (0, 0, 0))
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real APIs
+            disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+            def _send(self, payload, status=200):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if status == 429:
+                    self.send_header('Retry-After', '1')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                delay, fail = server._next_response()
+                if delay is None:
+                    self._send({'error': 'rate limited'}, 429)
+                    return
+                if delay:
+                    time.sleep(delay)
+                if fail:
+                    self._send({'error': 'injected failure'}, 500)
+                    return
+
+                url = urlparse(self.path)
+                if url.path == '/balance':
+                    addresses = parse_qs(url.query).get('active', [''])[0].split(',')
+                    payload = {}
+                    for address in filter(None, addresses):
+                        final_balance, n_tx, total_received = server._balance(address)
+                        payload[address] = {'final_balance': final_balance, 'n_tx': n_tx,
+                                            'total_received': total_received}
+                    self._send(payload)
+                elif url.path.startswith('/address/'):
+                    address = url.path[len('/address/'):]
+                    final_balance, n_tx, total_received = server._balance(address)
+                    self._send({
+                        'address': address,
+                        'chain_stats': {'funded_txo_sum': total_received,
+                                        'spent_txo_sum': total_received - final_balance,
+                                        'tx_count': n_tx},
+                        'mempool_stats': {'funded_txo_sum': 0, 'spent_txo_sum': 0, 'tx_count': 0}
+                    })
+                else:
+                    self._send({'error': 'not found'}, 404)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
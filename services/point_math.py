@@ -0,0 +1,80 @@
+"""
+Plain-integer secp256k1 point arithmetic for the hot derivation loops
+
+Points are Jacobian (X, Y, Z) tuples of ints, representing the affine point
+(X/Z^2, Y/Z^3). Working on bare ints avoids the per-operation object
+overhead of ecdsa's PointJacobi in loops that run millions of times.
+"""
+
+from ecdsa import SECP256k1
+
+P = SECP256k1.curve.p()
+GX = SECP256k1.generator.x()
+GY = SECP256k1.generator.y()
+
+def jacobian_double(x1, y1, z1):
+    """Double a Jacobian point (dbl-2009-l, a = 0)"""
+    a = x1 * x1 % P
+    b = y1 * y1 % P
+    c = b * b % P
+    d = 2 * ((x1 + b) * (x1 + b) - a - c) % P
+    e = 3 * a % P
+    x3 = (e * e - 2 * d) % P
+    y3 = (e * (d - x3) - 8 * c) % P
+    z3 = 2 * y1 * z1 % P
+    return x3, y3, z3
+
+def jacobian_add_affine(x1, y1, z1, x2, y2):
+    """Add an affine point to a Jacobian point (madd-2007-bl, a = 0)
+
+    Returns None when the result is the point at infinity.
+    """
+    z1z1 = z1 * z1 % P
+    u2 = x2 * z1z1 % P
+    s2 = y2 * z1 * z1z1 % P
+    h = (u2 - x1) % P
+    r = 2 * (s2 - y1) % P
+    if h == 0:
+        if r == 0:
+            return jacobian_double(x1, y1, z1)
+        return None
+    hh = h * h % P
+    i = 4 * hh % P
+    j = h * i % P
+    v = x1 * i % P
+    x3 = (r * r - j - 2 * v) % P
+    y3 = (r * (v - x3) - 2 * y1 * j) % P
+    z3 = ((z1 + h) * (z1 + h) - z1z1 - hh) % P
+    return x3, y3, z3
+
+def batch_inverse(values):
+    """Invert many field elements with a single modular inversion (Montgomery's trick)"""
+    prefix = []
+    acc = 1
+    for value in values:
+        prefix.append(acc)
+        acc = acc * value % P
+    inv = pow(acc, -1, P)
+    result = [0] * len(values)
+    for index in range(len(values) - 1, -1, -1):
+        result[index] = prefix[index] * inv % P
+        inv = inv * values[index] % P
+    return result
+
+def sequential_affine_points(x, y, count):
+    """Affine points (x, y), (x, y)+G, ... for `count` consecutive keys
+
+    Also returns the last point in Jacobian form so callers can checkpoint it.
+    """
+    jacobian = [(x, y, 1)]
+    current = (x, y, 1)
+    for _ in range(count - 1):
+        current = jacobian_add_affine(current[0], current[1], current[2], GX, GY)
+        jacobian.append(current)
+
+    inverses = batch_inverse([point[2] for point in jacobian])
+    points = []
+    for (jx, jy, _), z_inv in zip(jacobian, inverses):
+        z_inv2 = z_inv * z_inv % P
+        points.append((jx * z_inv2 % P, jy * z_inv2 * z_inv % P))
+    return points, current
@@ -0,0 +1,113 @@
+import threading
+from collections import deque
+from config import (ADDRESSES_PER_PAGE, BITCOIN_MAX_NUMBER, PREFETCH_DISTANCE, PREFETCH_QUEUE_SIZE,
+                    PREFETCH_WARM_BALANCES, PREFETCH_MAX_ACTIVE_REQUESTS)
+
+class RequestTracker:
+    """Count of foreground requests in flight, kept even before a prefetcher exists
+
+    The app tracks every request from the first one on a cold instance, so
+    a prefetcher created partway through that request already sees it.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.active = 0
+
+    def started(self):
+        with self.condition:
+            self.active += 1
+
+    def finished(self):
+        with self.condition:
+            self.active = max(0, self.active - 1)
+            self.condition.notify_all()
+
+class PrefetchService:
+    """Service that pre-generates neighboring pages in the background using idle capacity"""
+
+    def __init__(self, all_key_service, balance_service=None, tracker=None):
+        self.all_key_service = all_key_service
+        self.balance_service = balance_service
+        self.distance = PREFETCH_DISTANCE
+        self.warm_balances = PREFETCH_WARM_BALANCES and balance_service is not None
+        self.max_active_requests = PREFETCH_MAX_ACTIVE_REQUESTS
+        self.max_page = BITCOIN_MAX_NUMBER // ADDRESSES_PER_PAGE
+        self._queue = deque(maxlen=PREFETCH_QUEUE_SIZE)  # newest on the left, oldest dropped
+        self.tracker = tracker or RequestTracker()
+        self._condition = self.tracker.condition
+        self._thread = None
+        self._shutdown = False
+        self.pages_prefetched = 0
+
+    def schedule(self, page: int):
+        """Queue the neighbors of a page that was just served"""
+        neighbors = []
+        for offset in range(1, self.distance + 1):
+            neighbors.extend((page + offset, page - offset))
+
+        with self._condition:
+            if self._shutdown:
+                return
+            # Push the farthest pages first so the closest ones end up at the front
+            for neighbor in reversed(neighbors):
+                if neighbor < 1 or neighbor > self.max_page or neighbor in self._queue:
+                    continue
+                if self.all_key_service.is_cached(neighbor, ADDRESSES_PER_PAGE):
+                    continue
+                self._queue.appendleft(neighbor)
+            self._ensure_thread()
+            self._condition.notify()
+
+    def pending(self) -> list[int]:
+        """Pages waiting to be prefetched, next one first"""
+        with self._condition:
+            return list(self._queue)
+
+    def shutdown(self):
+        """Stop the prefetcher and drop queued work"""
+        with self._condition:
+            self._shutdown = True
+            self._queue.clear()
+            self._condition.notify_all()
+
+    def _ensure_thread(self):
+        """Start the worker thread on first use (caller holds the lock)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="Prefetch", daemon=True)
+            self._thread.start()
+
+    def _is_idle(self) -> bool:
+        return self.tracker.active <= self.max_active_requests
+
+    def _next_page(self):
+        """Block until there is work and the app is idle, then return the next page"""
+        with self._condition:
+            while not self._shutdown and (not self._queue or not self._is_idle()):
+                self._condition.wait(timeout=1.0)
+            if self._shutdown:
+                return None
+            return self._queue.popleft()
+
+    def _run(self):
+        """Worker loop: generate queued pages, then warm their balances if still idle"""
+        while True:
+            page = self._next_page()
+            if page is None:
+                return
+            try:
+                items = self.all_key_service.get_data(page, ADDRESSES_PER_PAGE)
+                self.pages_prefetched += 1
+
+                # Balance lookups spend the shared API budget, so only warm when nobody is
+                # waiting, and the balance service skips it when the rate budget is spent
+                with self._condition:
+                    warm = self.warm_balances and self._is_idle() and not self._shutdown
+                if warm:
+                    addresses = []
+                    for item in items:
+                        addresses.append(item.address_compressed)
+                        addresses.append(item.address_uncompressed)
+                    self.balance_service.warm(addresses)
+            except Exception as e:
+                print(f"Error prefetching page {page}: {e}")
@@ -0,0 +1,156 @@
+import os
+import struct
+from array import array
+from typing import List, Optional
+from services.address_encoding import script_key
+from config import ADDRESSES_PER_PAGE, RANGE_INDEX_BLOCK_PAGES, RANGE_INDEX_PATH
+
+class FenwickTree:
+    """Prefix sums over a fixed number of integer slots with O(log n) updates and queries"""
+
+    def __init__(self, values: List[int]):
+        # Built in O(n): each node pushes its partial sum to its parent once
+        self.size = len(values)
+        self._tree = array('q', [0]) + array('q', values)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self._tree[parent] += self._tree[i]
+
+    def add(self, index: int, delta: int):
+        """Add delta to slot `index` (0-based)"""
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix(self, count: int) -> int:
+        """Sum of the first `count` slots"""
+        total = 0
+        i = count
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def range_sum(self, first: int, last: int) -> int:
+        """Sum of slots first..last inclusive (0-based)"""
+        return self.prefix(last + 1) - self.prefix(first)
+
+class RangeIndex:
+    """Balance totals over a page range, answered from per-block sums in O(log n)
+
+    The indexed pages are split into blocks of block_pages pages. Building
+    sweeps every key in the range once, looks up all of its output scripts
+    (P2PKH compressed and uncompressed, P2WPKH, P2SH-P2WPKH and, when the
+    snapshot has any, P2TR) in the local snapshot and adds them to the
+    key's block: final balance, total received and the number of outputs
+    with a positive balance. Queries round out to whole blocks and are
+    clipped to the indexed range; the answer says which pages it covers.
+
+    The index records the snapshot height it was built at, so callers can
+    tell when newer deltas have been applied since.
+    """
+
+    MAGIC = b'AKRIDX02'
+    HEADER = struct.Struct('<8sII32sQq')  # magic, limit_per_page, block_pages, start_page (32 bytes), blocks, height (-1: none)
+    FIELDS = ('total_balance', 'total_received', 'funded_addresses')
+
+    def __init__(self, start_page: int, block_pages: int, limit_per_page: int, sums: List[List[int]],
+                 height: Optional[int] = None):
+        self.start_page = start_page
+        self.block_pages = block_pages
+        self.limit_per_page = limit_per_page
+        self.blocks = len(sums[0])
+        self.height = height
+        self._trees = [FenwickTree(values) for values in sums]
+
+    @property
+    def end_page(self) -> int:
+        return self.start_page + self.blocks * self.block_pages - 1
+
+    @classmethod
+    def build(cls, snapshot, all_key_service, start_page: int, pages: int, block_pages: int = RANGE_INDEX_BLOCK_PAGES,
+              limit_per_page: int = ADDRESSES_PER_PAGE, progress=None) -> 'RangeIndex':
+        """Sweep pages start_page..start_page+pages-1 (rounded up to whole blocks) against the snapshot"""
+        blocks = -(-pages // block_pages)
+        sums = [[0] * blocks for _ in cls.FIELDS]
+        balances, received, funded = sums
+        include_taproot = snapshot.has_kind('p2tr')
+        height = snapshot.height()
+
+        sweep = all_key_service.iter_page_hashes(start_page, blocks * block_pages, limit_per_page, include_taproot)
+        for page, _, rows in sweep:
+            scripts = []
+            for hash160_uncompressed, hash160_compressed, script_hash, taproot_program in rows:
+                scripts.append(script_key('p2pkh', hash160_compressed))
+                scripts.append(script_key('p2pkh', hash160_uncompressed))
+                scripts.append(script_key('p2wpkh', hash160_compressed))
+                scripts.append(script_key('p2sh', script_hash))
+                if taproot_program is not None:
+                    scripts.append(script_key('p2tr', taproot_program))
+            block = (page - start_page) // block_pages
+            for balance in snapshot.lookup_scripts(scripts).values():
+                balances[block] += balance.final_balance
+                received[block] += balance.total_received
+                if balance.final_balance > 0:
+                    funded[block] += 1
+            if progress is not None:
+                progress(page - start_page + 1, blocks * block_pages)
+        return cls(start_page, block_pages, limit_per_page, sums, height)
+
+    def query(self, start_page: int, end_page: int) -> Optional[dict]:
+        """Totals over the blocks covering start_page..end_page, or None if the range misses the index"""
+        first = max(start_page, self.start_page)
+        last = min(end_page, self.end_page)
+        if first > last:
+            return None
+        first_block = (first - self.start_page) // self.block_pages
+        last_block = (last - self.start_page) // self.block_pages
+        totals = {
+            'start_page': self.start_page + first_block * self.block_pages,
+            'end_page': self.start_page + (last_block + 1) * self.block_pages - 1
+        }
+        for field, tree in zip(self.FIELDS, self._trees):
+            totals[field] = tree.range_sum(first_block, last_block)
+        return totals
+
+    def save(self, path: str = RANGE_INDEX_PATH):
+        """Write the per-block sums (the trees are rebuilt on load); replaces the file atomically"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.limit_per_page, self.block_pages, self.start_page.to_bytes(32, 'big'), self.blocks,
+                                     -1 if self.height is None else self.height))
+            for tree in self._trees:
+                array('q', (tree.range_sum(block, block) for block in range(self.blocks))).tofile(f)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str = RANGE_INDEX_PATH) -> Optional['RangeIndex']:
+        """The saved index, or None if there is none (or it is unreadable)"""
+        try:
+            with open(path, 'rb') as f:
+                magic, limit_per_page, block_pages, start_page, blocks, height = cls.HEADER.unpack(f.read(cls.HEADER.size))
+                if magic != cls.MAGIC:
+                    return None
+                sums = []
+                for _ in cls.FIELDS:
+                    values = array('q')
+                    values.fromfile(f, blocks)
+                    sums.append(values.tolist())
+        except (OSError, EOFError, struct.error):
+            return None
+        return cls(int.from_bytes(start_page, 'big'), block_pages, limit_per_page, sums, None if height < 0 else height)
+
+    def stats(self) -> dict:
+        return {
+            'start_page': self.start_page,
+            'end_page': self.end_page,
+            'block_pages': self.block_pages,
+            'blocks': self.blocks,
+            'limit_per_page': self.limit_per_page,
+            'height': self.height
+        }
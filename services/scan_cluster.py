@@ -0,0 +1,247 @@
+import json
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from models.scan_lease import ScanLease
+from services.address_encoding import encode_address, script_key
+from config import ADDRESSES_PER_PAGE, SCAN_LEASE_PAGES, SCAN_LEASE_TTL
+
+class ScanCoordinator:
+    """Splits a page range into leases and tracks which workers hold them
+
+    Leases are created on demand from a moving start pointer, so the range
+    can be arbitrarily large. A lease whose deadline passes without a
+    heartbeat or report is handed to the next worker that asks.
+    """
+
+    def __init__(self, start_page: int, max_pages: int, lease_pages: int = SCAN_LEASE_PAGES,
+                 lease_ttl: float = SCAN_LEASE_TTL, clock=time.monotonic):
+        self.start_page = start_page
+        self.end_page = start_page + max_pages - 1
+        self.lease_pages = lease_pages
+        self.lease_ttl = lease_ttl
+        self.clock = clock
+        self._next_page = start_page
+        self._next_lease_id = 1
+        self._active: Dict[int, ScanLease] = {}
+        self._lock = threading.Lock()
+        self.hits: List[dict] = []
+        self.pages_done = 0
+        self.keys_scanned = 0
+        self.reassigned = 0
+        self.workers = set()
+        self.released_workers = set()  # workers already told there is nothing left
+        self.started_at = clock()
+        self.finished_at = None
+
+    def claim(self, worker_id: str) -> Optional[ScanLease]:
+        """Hand out an expired lease if there is one, otherwise the next unscanned range"""
+        with self._lock:
+            now = self.clock()
+            self.workers.add(worker_id)
+            for lease in self._active.values():
+                if lease.deadline < now:
+                    lease.worker_id = worker_id
+                    lease.deadline = now + self.lease_ttl
+                    lease.attempts += 1
+                    self.reassigned += 1
+                    return lease
+            if self._next_page > self.end_page:
+                if not self._active:
+                    self.released_workers.add(worker_id)
+                return None
+            pages = min(self.lease_pages, self.end_page - self._next_page + 1)
+            lease = ScanLease(lease_id=self._next_lease_id, start_page=self._next_page, pages=pages,
+                              worker_id=worker_id, deadline=now + self.lease_ttl, attempts=1)
+            self._next_lease_id += 1
+            self._next_page += pages
+            self._active[lease.lease_id] = lease
+            return lease
+
+    def heartbeat(self, lease_id: int, worker_id: str) -> bool:
+        """Extend a lease; False tells the worker it no longer owns it"""
+        with self._lock:
+            lease = self._active.get(lease_id)
+            if lease is None or lease.worker_id != worker_id:
+                return False
+            lease.deadline = self.clock() + self.lease_ttl
+            return True
+
+    def report(self, lease_id: int, worker_id: str, hits: List[dict], keys_scanned: int) -> bool:
+        """Record a finished lease; results for a lease already completed or now held by another worker are ignored"""
+        with self._lock:
+            lease = self._active.get(lease_id)
+            if lease is None or lease.worker_id != worker_id:
+                return False
+            del self._active[lease_id]
+            lease.completed = True
+            self.hits.extend(hits)
+            self.pages_done += lease.pages
+            self.keys_scanned += keys_scanned
+            if self.done and self.finished_at is None:
+                self.finished_at = self.clock()
+            return True
+
+    @property
+    def done(self) -> bool:
+        return self._next_page > self.end_page and not self._active
+
+    @property
+    def all_workers_released(self) -> bool:
+        with self._lock:
+            return self.workers <= self.released_workers
+
+    def status(self) -> dict:
+        with self._lock:
+            elapsed = (self.finished_at or self.clock()) - self.started_at
+            return {
+                'start_page': self.start_page,
+                'end_page': self.end_page,
+                'pages_total': self.end_page - self.start_page + 1,
+                'pages_done': self.pages_done,
+                'active_leases': len(self._active),
+                'reassigned_leases': self.reassigned,
+                'workers': len(self.workers),
+                'hits': len(self.hits),
+                'keys_scanned': self.keys_scanned,
+                'elapsed': round(elapsed, 3),
+                'keys_per_second': round(self.keys_scanned / elapsed) if elapsed > 0 else 0,
+                'done': self.done
+            }
+
+def make_coordinator_server(coordinator: ScanCoordinator, host: str, port: int) -> ThreadingHTTPServer:
+    """Plain HTTP/JSON front end for a coordinator (port 0 picks a free port)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, payload, status=200):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/status':
+                self._send(coordinator.status())
+            elif self.path == '/hits':
+                self._send(coordinator.hits)
+            else:
+                self._send({'error': 'not found'}, 404)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                data = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self._send({'error': 'invalid JSON'}, 400)
+                return
+            worker_id = str(data.get('worker_id', ''))
+            if self.path == '/claim':
+                lease = coordinator.claim(worker_id)
+                self._send({
+                    'lease': None if lease is None else {
+                        'lease_id': lease.lease_id, 'start_page': lease.start_page, 'pages': lease.pages
+                    },
+                    'done': coordinator.done,
+                    'lease_ttl': coordinator.lease_ttl
+                })
+            elif self.path == '/heartbeat':
+                self._send({'ok': coordinator.heartbeat(int(data['lease_id']), worker_id)})
+            elif self.path == '/report':
+                ok = coordinator.report(int(data['lease_id']), worker_id, data.get('hits', []),
+                                        int(data.get('keys_scanned', 0)))
+                self._send({'ok': ok})
+            else:
+                self._send({'error': 'not found'}, 404)
+
+        def log_message(self, format, *args):
+            pass  # one line per lease would drown the progress output
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+class ScanWorker:
+    """Claims leases from a coordinator, scans them against a local snapshot and reports hits"""
+
+    def __init__(self, coordinator_url: str, snapshot, all_key_service=None, worker_id: Optional[str] = None,
+                 limit_per_page: int = ADDRESSES_PER_PAGE, poll_interval: float = 1.0):
+        if all_key_service is None:
+            from services.all_key_service import AllKeyService
+            all_key_service = AllKeyService()
+        self.coordinator_url = coordinator_url.rstrip('/')
+        self.snapshot = snapshot
+        self.all_key_service = all_key_service
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+        self.limit_per_page = limit_per_page
+        self.poll_interval = poll_interval
+        self.leases_done = 0
+
+    def _post(self, path: str, payload: dict) -> dict:
+        import requests
+        payload = dict(payload, worker_id=self.worker_id)
+        response = requests.post(f"{self.coordinator_url}{path}", json=payload, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def run(self):
+        """Work until the coordinator has no leases left"""
+        while True:
+            reply = self._post('/claim', {})
+            lease = reply['lease']
+            if lease is None:
+                if reply['done']:
+                    return
+                # Remaining leases are held by other workers; wait in case one expires
+                time.sleep(self.poll_interval)
+                continue
+            heartbeat_every = reply['lease_ttl'] / 3
+            hits, keys_scanned = self.scan(lease['start_page'], lease['pages'], lease['lease_id'], heartbeat_every)
+            if hits is None:
+                continue  # lease was taken away; drop the partial result
+            self._post('/report', {'lease_id': lease['lease_id'], 'hits': hits, 'keys_scanned': keys_scanned})
+            self.leases_done += 1
+
+    def scan(self, start_page: int, pages: int, lease_id: Optional[int] = None,
+             heartbeat_every: Optional[float] = None):
+        """Derive the pages and look every output up in the snapshot; returns (hits, keys scanned)"""
+        include_taproot = self.snapshot.has_kind('p2tr')
+        hits = []
+        keys_scanned = 0
+        last_heartbeat = time.monotonic()
+        sweep = self.all_key_service.iter_page_hashes(start_page, pages, self.limit_per_page, include_taproot)
+        for page, first_key, rows in sweep:
+            candidates = {}
+            for index, (hash160_uncompressed, hash160_compressed, script_hash, taproot_program) in enumerate(rows):
+                outputs = [('p2pkh', hash160_compressed, 'p2pkh_compressed'),
+                           ('p2pkh', hash160_uncompressed, 'p2pkh_uncompressed'),
+                           ('p2wpkh', hash160_compressed, 'p2wpkh'),
+                           ('p2sh', script_hash, 'p2sh_p2wpkh')]
+                if taproot_program is not None:
+                    outputs.append(('p2tr', taproot_program, 'p2tr'))
+                for kind, program, address_type in outputs:
+                    candidates[script_key(kind, program)] = (index, kind, program, address_type)
+            keys_scanned += len(rows)
+
+            for script, balance in self.snapshot.lookup_scripts(list(candidates)).items():
+                if balance.final_balance <= 0:
+                    continue
+                index, kind, program, address_type = candidates[script]
+                hits.append({
+                    'page': page,
+                    'position': index + 1,
+                    'private_key': self.all_key_service._get_private_key(format(first_key + index, '064x')),
+                    'address': encode_address(kind, program),
+                    'address_type': address_type,
+                    'final_balance': balance.final_balance,
+                    'total_received': balance.total_received,
+                    'n_tx': balance.n_tx
+                })
+
+            if lease_id is not None and heartbeat_every and time.monotonic() - last_heartbeat > heartbeat_every:
+                if not self._post('/heartbeat', {'lease_id': lease_id})['ok']:
+                    return None, keys_scanned
+                last_heartbeat = time.monotonic()
+        return hits, keys_scanned
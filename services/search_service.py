@@ -0,0 +1,69 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+from services.address_encoding import decode_address
+from config import ADDRESSES_PER_PAGE
+
+class SearchService:
+    """Service for locating addresses in the sequential key space
+
+    Any number of target addresses is decoded into a lookup table keyed by
+    (kind, hash), and the key range is swept once: each derived key costs a
+    few dict lookups no matter how many targets there are.
+    """
+
+    def __init__(self, all_key_service):
+        self.all_key_service = all_key_service
+
+    def decode_address(self, address: str) -> Optional[Tuple[str, bytes]]:
+        """Decode an address to (kind, hash), or None if it is not a supported type"""
+        return decode_address(address)
+
+    def build_targets(self, addresses: List[str]) -> Tuple[Dict[Tuple[str, bytes], str], List[str]]:
+        """Map (kind, hash) -> address for every decodable address; also return the rest"""
+        targets = {}
+        invalid = []
+        for address in addresses:
+            address = address.strip()
+            if not address:
+                continue
+            decoded = self.decode_address(address)
+            if decoded is None:
+                invalid.append(address)
+            else:
+                targets[decoded] = address
+        return targets, invalid
+
+    def search(self, targets: Dict[Tuple[str, bytes], str], start_page: int, max_pages: int,
+               limit_per_page: int = ADDRESSES_PER_PAGE) -> Iterator[dict]:
+        """Sweep pages once, yielding a match dict as soon as each target is found
+
+        Stops early once every target has been found. Taproot output keys
+        cost an extra multiplication per key, so they are only derived when a
+        P2TR address is among the targets.
+        """
+        remaining = dict(targets)
+        if not remaining:
+            return
+        include_taproot = any(kind == 'p2tr' for kind, _ in remaining)
+        sweep = self.all_key_service.iter_page_hashes(start_page, max_pages, limit_per_page, include_taproot)
+        for page, first_key, rows in sweep:
+            for index, (hash160_uncompressed, hash160_compressed, script_hash, taproot_program) in enumerate(rows):
+                candidates = (
+                    (('p2pkh', hash160_compressed), 'p2pkh_compressed'),
+                    (('p2pkh', hash160_uncompressed), 'p2pkh_uncompressed'),
+                    (('p2wpkh', hash160_compressed), 'p2wpkh'),
+                    (('p2sh', script_hash), 'p2sh_p2wpkh'),
+                    (('p2tr', taproot_program), 'p2tr')
+                )
+                for target, address_type in candidates:
+                    if target in remaining:
+                        key_hex = format(first_key + index, '064x')
+                        yield {
+                            'address': remaining.pop(target),
+                            'page': page,
+                            'position': index + 1,
+                            'private_key': self.all_key_service._get_private_key(key_hex),
+                            'is_compressed': address_type != 'p2pkh_uncompressed',
+                            'address_type': address_type
+                        }
+            if not remaining:
+                return
@@ -0,0 +1,305 @@
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+from models.blockchain import Blockchain
+from config import (ADDRESSES_PER_PAGE, SHARED_CACHE_PATH, SHARED_CACHE_SIZE_MB, SHARED_CACHE_PAGE_FRACTION)
+
+try:
+    import fcntl
+except ImportError:  # Windows: still shared between threads, writers just aren't serialized across processes
+    fcntl = None
+
+class SharedCache:
+    """Host-wide cache of derived pages and balances in one memory-mapped file
+
+    Every worker process maps the same file, so a page derived or a balance
+    fetched by one worker is a hit for all of them and the whole host stays
+    within one memory budget. The file holds two open-addressed tables of
+    fixed-size records:
+
+    - page slots: the hash160s (uncompressed, compressed, P2SH-P2WPKH) and
+      P2TR program of every key on a page; addresses are re-encoded on read,
+      which skips all the EC work
+    - balance records: a 20-byte digest of the address plus final balance,
+      total received, transaction count and fetch time
+
+    Each slot starts with a sequence number that is odd while it is being
+    written. Readers copy a slot and retry if the number changed, so reads
+    take no lock at all; writers serialize on a file lock. When a probe
+    window is full the oldest record in it is replaced.
+    """
+
+    MAGIC = b'AKSHC001'
+    HEADER = struct.Struct('<8sIIII')
+    HEADER_SIZE = 64
+    PAGE_HEADER = struct.Struct('<IIId32s')    # seq, limit, has_taproot, stored_at, page number
+    ROW_SIZE = 92                              # 3 x 20-byte hash + 32-byte taproot program
+    BALANCE_RECORD = struct.Struct('<I20sqqqd')  # seq, address digest, final, received, n_tx, fetched_at
+    SEQ = struct.Struct('<I')
+    PROBE_LIMIT = 8
+    READ_RETRIES = 4
+
+    def __init__(self, path: str = SHARED_CACHE_PATH, size_mb: float = SHARED_CACHE_SIZE_MB,
+                 page_fraction: float = SHARED_CACHE_PAGE_FRACTION, rows_per_page: int = ADDRESSES_PER_PAGE):
+        budget = int(size_mb * 1024 * 1024) - self.HEADER_SIZE
+        self.rows_per_page = rows_per_page
+        self.page_slot_size = self.PAGE_HEADER.size + rows_per_page * self.ROW_SIZE
+        self.page_slots = max(1, int(budget * page_fraction) // self.page_slot_size)
+        self.balance_slots = max(1, (budget - self.page_slots * self.page_slot_size) // self.BALANCE_RECORD.size)
+        self._balance_base = self.HEADER_SIZE + self.page_slots * self.page_slot_size
+        self.file_size = self._balance_base + self.balance_slots * self.BALANCE_RECORD.size
+        self._header = self.HEADER.pack(self.MAGIC, self.rows_per_page, self.page_slots, self.balance_slots, 0)
+
+        # Workers with a different layout get their own file instead of
+        # resizing one that other processes have mapped
+        root, ext = os.path.splitext(path)
+        self.path = f"{root}-{hashlib.sha1(self._header).hexdigest()[:8]}{ext}"
+
+        self._map = None
+        self._fd = None
+        self._disabled = False
+        self._open_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.page_hits = 0
+        self.page_misses = 0
+        self.balance_hits = 0
+        self.balance_misses = 0
+
+    def _ensure_open(self) -> bool:
+        if self._map is not None:
+            return True
+        if self._disabled:
+            return False
+        with self._open_lock:
+            if self._map is None and not self._disabled:
+                try:
+                    self._open()
+                except OSError as e:
+                    # Read-only or missing shared memory: run with process-local caching only
+                    print(f"Shared cache disabled, could not map {self.path}: {e}")
+                    self._disabled = True
+        return self._map is not None
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                os.lseek(fd, 0, os.SEEK_SET)
+                header = os.read(fd, len(self._header))
+                if os.fstat(fd).st_size != self.file_size or header != self._header:
+                    # New (or torn) file: zero it and stamp the layout
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, self.file_size)
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    os.write(fd, self._header)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(fd, self.file_size)
+        except OSError:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def close(self):
+        with self._open_lock:
+            if self._map is not None:
+                self._map.close()
+                os.close(self._fd)
+                self._map = None
+                self._fd = None
+
+    @contextmanager
+    def _writing(self):
+        """Serialize writers: threads on the lock, processes on the file lock"""
+        with self._write_lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _probe(self, digest: bytes, slots: int) -> Iterable[int]:
+        start = int.from_bytes(digest[:8], 'little') % slots
+        return ((start + i) % slots for i in range(min(self.PROBE_LIMIT, slots)))
+
+    def _read_stable(self, offset: int, read):
+        """Run read() over a slot and return its result if no writer touched the slot meanwhile"""
+        m = self._map
+        for _ in range(self.READ_RETRIES):
+            seq = self.SEQ.unpack_from(m, offset)[0]
+            if seq & 1:
+                continue
+            result = read()
+            if self.SEQ.unpack_from(m, offset)[0] == seq:
+                return result
+        return None
+
+    def _write_slot(self, offset: int, write):
+        """Run write() over a slot with its sequence number odd for the duration (caller holds the write lock)"""
+        m = self._map
+        seq = self.SEQ.unpack_from(m, offset)[0]
+        self.SEQ.pack_into(m, offset, (seq + 1) & 0xffffffff)
+        write((seq + 1) & 0xffffffff)
+        self.SEQ.pack_into(m, offset, (seq + 2) & 0xffffffff)
+
+    # Pages
+
+    def _page_offset(self, slot: int) -> int:
+        return self.HEADER_SIZE + slot * self.page_slot_size
+
+    @staticmethod
+    def _page_key(page: int, limit_per_page: int):
+        key = page.to_bytes(32, 'big')
+        return key, hashlib.blake2b(key + limit_per_page.to_bytes(4, 'big'), digest_size=8).digest()
+
+    def get_page(self, page: int, limit_per_page: int, need_taproot: bool = False) -> Optional[List[tuple]]:
+        """Rows of (hash160_uncompressed, hash160_compressed, p2sh_p2wpkh_hash, taproot_program|None), or None"""
+        if limit_per_page > self.rows_per_page or not self._ensure_open():
+            return None
+        key, digest = self._page_key(page, limit_per_page)
+        m = self._map
+        header = self.PAGE_HEADER
+        for slot in self._probe(digest, self.page_slots):
+            offset = self._page_offset(slot)
+            fields = self._read_stable(offset, lambda: header.unpack_from(m, offset))
+            if fields is None:
+                continue
+            _, limit, has_taproot, stored_at, slot_key = fields
+            if stored_at == 0:
+                break  # records are never removed, so an empty slot ends the probe
+            if slot_key != key or limit != limit_per_page:
+                continue
+            if need_taproot and not has_taproot:
+                break
+            start = offset + header.size
+            end = start + limit * self.ROW_SIZE
+            copied = self._read_stable(offset, lambda: (header.unpack_from(m, offset), m[start:end]))
+            if copied is None or copied[0][4] != key or copied[0][1:3] != (limit, has_taproot):
+                break  # rewritten while we looked; treat as a miss
+            payload = copied[1]
+            self.page_hits += 1
+            size = self.ROW_SIZE
+            return [(payload[i:i + 20], payload[i + 20:i + 40], payload[i + 40:i + 60],
+                     payload[i + 60:i + 92] if has_taproot else None)
+                    for i in range(0, limit * size, size)]
+        self.page_misses += 1
+        return None
+
+    def put_page(self, page: int, limit_per_page: int, rows: List[tuple]):
+        """Store a page's rows, replacing the oldest page in its probe window if needed"""
+        if limit_per_page > self.rows_per_page or len(rows) != limit_per_page or not self._ensure_open():
+            return
+        has_taproot = all(row[3] is not None for row in rows)
+        padding = bytes(32)
+        payload = b''.join(row[0] + row[1] + row[2] + (row[3] if has_taproot else padding) for row in rows)
+        key, digest = self._page_key(page, limit_per_page)
+        m = self._map
+        header = self.PAGE_HEADER
+
+        with self._writing():
+            target = None
+            oldest = None
+            for slot in self._probe(digest, self.page_slots):
+                offset = self._page_offset(slot)
+                _, limit, _, stored_at, slot_key = header.unpack_from(m, offset)
+                if stored_at == 0 or (slot_key == key and limit == limit_per_page):
+                    target = offset
+                    break
+                if oldest is None or stored_at < oldest[0]:
+                    oldest = (stored_at, offset)
+            if target is None:
+                target = oldest[1]
+
+            def write(seq):
+                header.pack_into(m, target, seq, limit_per_page, int(has_taproot), time.time(), key)
+                start = target + header.size
+                m[start:start + len(payload)] = payload
+            self._write_slot(target, write)
+
+    # Balances
+
+    def _balance_offset(self, slot: int) -> int:
+        return self._balance_base + slot * self.BALANCE_RECORD.size
+
+    @staticmethod
+    def _address_key(address: str) -> bytes:
+        return hashlib.blake2b(address.encode('utf-8'), digest_size=20).digest()
+
+    def get_balances(self, addresses: List[str], max_age: float) -> Dict[str, Blockchain]:
+        """Balances fetched less than max_age seconds ago, for the addresses that have one"""
+        if not self._ensure_open():
+            return {}
+        m = self._map
+        record = self.BALANCE_RECORD
+        oldest_allowed = time.time() - max_age
+        found = {}
+        for address in addresses:
+            key = self._address_key(address)
+            for slot in self._probe(key, self.balance_slots):
+                offset = self._balance_offset(slot)
+                fields = self._read_stable(offset, lambda: record.unpack_from(m, offset))
+                if fields is None:
+                    continue
+                _, slot_key, final_balance, total_received, n_tx, fetched_at = fields
+                if fetched_at == 0:
+                    break
+                if slot_key == key:
+                    if fetched_at >= oldest_allowed:
+                        found[address] = Blockchain(final_balance=final_balance, n_tx=n_tx,
+                                                    total_received=total_received)
+                    break
+        self.balance_hits += len(found)
+        self.balance_misses += len(addresses) - len(found)
+        return found
+
+    def put_balances(self, balances: Dict[str, Blockchain]):
+        """Store freshly fetched balances with the current time"""
+        if not balances or not self._ensure_open():
+            return
+        m = self._map
+        record = self.BALANCE_RECORD
+        fetched_at = time.time()
+        with self._writing():
+            for address, balance in balances.items():
+                key = self._address_key(address)
+                target = None
+                oldest = None
+                for slot in self._probe(key, self.balance_slots):
+                    offset = self._balance_offset(slot)
+                    _, slot_key, _, _, _, slot_fetched_at = record.unpack_from(m, offset)
+                    if slot_fetched_at == 0 or slot_key == key:
+                        target = offset
+                        break
+                    if oldest is None or slot_fetched_at < oldest[0]:
+                        oldest = (slot_fetched_at, offset)
+                if target is None:
+                    target = oldest[1]
+                self._write_slot(target, lambda seq: record.pack_into(
+                    m, target, seq, key, balance.final_balance, balance.total_received, balance.n_tx, fetched_at))
+
+    def stats(self) -> dict:
+        """Layout and this process's hit counters"""
+        return {
+            'path': self.path,
+            'enabled': self._map is not None,
+            'size_bytes': self.file_size,
+            'page_slots': self.page_slots,
+            'balance_slots': self.balance_slots,
+            'page_hits': self.page_hits,
+            'page_misses': self.page_misses,
+            'balance_hits': self.balance_hits,
+            'balance_misses': self.balance_misses
+        }
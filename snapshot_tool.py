@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Manage the local balance snapshot used by scans
+
+Usage:
+    python snapshot_tool.py import balances.csv --height 850000
+    python snapshot_tool.py apply deltas/
+    python snapshot_tool.py apply deltas/ --watch 10
+    python snapshot_tool.py index --pages 10000 --block-pages 10
+    python snapshot_tool.py info
+
+The CSV has one address,final_balance,n_tx,total_received row per address.
+Delta files use the same columns for the addresses one block changed and
+are named after the block height (850001.csv or 850001-<hash>.csv); blocks
+at or below the snapshot height are skipped, so a feed directory can be
+applied again safely. Blocks must follow on from the snapshot height: a
+missing block stops the apply there (and exits non-zero) until it turns
+up. With --watch the directory is polled for new blocks.
+The index command sweeps a page range against the snapshot and saves the
+per-block totals behind /api/range-totals; rebuild it after applying deltas.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.balance_snapshot import BalanceSnapshot
+from config import ADDRESSES_PER_PAGE, BALANCE_SNAPSHOT_PATH, BITCOIN_MAX_NUMBER, RANGE_INDEX_BLOCK_PAGES, RANGE_INDEX_PATH
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local balance snapshot")
+    parser.add_argument('--snapshot', default=BALANCE_SNAPSHOT_PATH, help="snapshot database path")
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_command = commands.add_parser('import', help="import a CSV of balances")
+    import_command.add_argument('file')
+    import_command.add_argument('--height', type=int, help="block height the CSV is current as of")
+    apply_command = commands.add_parser('apply', help="apply per-block delta files from a directory")
+    apply_command.add_argument('directory')
+    apply_command.add_argument('--watch', type=float, metavar='SECONDS', help="keep polling for new deltas")
+    index_command = commands.add_parser('index', help="build the range totals index for a page range")
+    index_command.add_argument('--start-page', type=int, default=1)
+    index_command.add_argument('--pages', type=int, required=True)
+    index_command.add_argument('--block-pages', type=int, default=RANGE_INDEX_BLOCK_PAGES,
+                               help="pages per block (range totals round out to whole blocks)")
+    index_command.add_argument('--output', default=RANGE_INDEX_PATH, help="index file path")
+    commands.add_parser('info', help="show snapshot statistics")
+    args = parser.parse_args()
+
+    snapshot = BalanceSnapshot(args.snapshot)
+    if args.command in ('index', 'info') and not snapshot.exists():
+        raise SystemExit(f"No balance snapshot at {args.snapshot}; import one first")
+    if args.command == 'import':
+        start = time.perf_counter()
+        imported, skipped = snapshot.import_csv(args.file, args.height)
+        print(f"✓ Imported {imported:,} addresses ({skipped:,} skipped) in {time.perf_counter() - start:.2f}s")
+    elif args.command == 'apply':
+        def report(height, updated, skipped, seconds):
+            print(f"✓ Block {height}: {updated:,} addresses ({skipped:,} skipped) in {seconds * 1000:.1f}ms")
+        reported_gap = None
+        while True:
+            _, missing = snapshot.apply_delta_directory(args.directory, report)
+            if missing is not None and missing != reported_gap:
+                print(f"✗ Block {missing} is missing from {args.directory}; stopped at height {snapshot.height()}")
+                reported_gap = missing
+            if args.watch is None:
+                break
+            time.sleep(args.watch)
+        print(f"Snapshot height: {snapshot.height()}")
+        if missing is not None:
+            sys.exit(1)
+    elif args.command == 'index':
+        # The sweep rounds up to whole blocks, and every block must end within the keyspace
+        max_page = BITCOIN_MAX_NUMBER // ADDRESSES_PER_PAGE
+        if args.start_page < 1 or args.pages < 1 or args.block_pages < 1:
+            raise SystemExit("--start-page, --pages and --block-pages must be 1 or greater")
+        swept = -(-args.pages // args.block_pages) * args.block_pages
+        if args.start_page + swept - 1 > max_page:
+            raise SystemExit(f"Indexed pages (rounded up to whole blocks) must lie within 1-{max_page}")
+        from services.all_key_service import AllKeyService
+        from services.range_index import RangeIndex
+        start = time.perf_counter()
+        def progress(done, total):
+            if done % 100 == 0 or done == total:
+                print(f"  {done:,}/{total:,} pages", end='\n' if done == total else '\r', flush=True)
+        index = RangeIndex.build(snapshot, AllKeyService(), args.start_page, args.pages, args.block_pages,
+                                 ADDRESSES_PER_PAGE, progress)
+        index.save(args.output)
+        totals = index.query(index.start_page, index.end_page)
+        print(f"✓ Indexed pages {index.start_page:,}-{index.end_page:,} in {index.blocks:,} blocks "
+              f"in {time.perf_counter() - start:.1f}s: {totals['funded_addresses']:,} funded addresses, "
+              f"{totals['total_balance']:,} sat")
+    elif args.command == 'info':
+        print(f"Snapshot: {args.snapshot}")
+        print(f"Addresses: {snapshot.count():,}")
+        print(f"Height: {snapshot.height()}")
+
+if __name__ == "__main__":
+    main()
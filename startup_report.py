@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Cold-start report: how long a fresh process takes to import the app
+
+Runs `import app` in a clean interpreter with -X importtime, lists the
+slowest imports and checks the total against STARTUP_IMPORT_BUDGET.
+"""
+
+import os
+import subprocess
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import STARTUP_IMPORT_BUDGET
+
+HEAVY_MODULES = ('ecdsa', 'base58', 'requests')
+
+PROBE = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import app\n"
+    "elapsed = time.perf_counter() - start\n"
+    f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+    "print(f'{elapsed:.6f}', ','.join(heavy))\n"
+)
+
+def measure_cold_import(importtime=False):
+    """Import the app in a fresh interpreter; return (seconds, heavy modules loaded, stderr)"""
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', PROBE]
+    result = subprocess.run(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    elapsed, _, heavy = result.stdout.strip().partition(' ')
+    return float(elapsed), [m for m in heavy.split(',') if m], result.stderr
+
+def main():
+    """Print the import-time report"""
+    print("=" * 50)
+    print("All Bitcoin Private Key - Cold Start Report")
+    print("=" * 50)
+
+    elapsed, heavy, stderr = measure_cold_import(importtime=True)
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|').split('|')]
+        imports.append((int(cumulative_us), int(self_us), name))
+
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative_us, self_us, name in sorted(imports, reverse=True)[:15]:
+        print(f"{cumulative_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name.strip()}")
+
+    # -X importtime adds overhead, so measure the budget on a clean run
+    elapsed, heavy, _ = measure_cold_import()
+    print()
+    print(f"Cold import: {elapsed * 1000:.1f} ms (budget {STARTUP_IMPORT_BUDGET * 1000:.0f} ms)")
+    print(f"Heavy modules loaded at import: {', '.join(heavy) if heavy else 'none'}")
+    if elapsed > STARTUP_IMPORT_BUDGET or heavy:
+        print("✗ Startup budget exceeded")
+        sys.exit(1)
+    print("✓ Within startup budget")
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,19 @@
 Test script for the All Bitcoin Private Key application
 """
 
+import atexit
+import shutil
 import sys
 import os
+import tempfile
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Keep the app's shared cache out of /dev/shm; set before any service binds the path
+import config
+_shared_cache_directory = tempfile.mkdtemp(prefix='all-bitcoin-keys-test-')
+config.SHARED_CACHE_PATH = os.path.join(_shared_cache_directory, 'cache.bin')
+atexit.register(shutil.rmtree, _shared_cache_directory, ignore_errors=True)
+
 from services.all_key_service import AllKeyService
 from services.balance_service import BalanceService
 from models.all_key import AllKey
@@ -105,6 +114,795 @@ def test_integration():
         print(f"✗ Integration test failed: {e}")
         return False
 
+def test_key_page_caching():
+    """Test ETag/Cache-Control and conditional GET on key pages"""
+    print("Testing key page caching...")
+    
+    from app import app
+    client = app.test_client()
+    
+    response = client.get('/home?page=2')
+    etag = response.headers['ETag']
+    print(f"  ETag: {etag}")
+    print(f"  Cache-Control: {response.headers['Cache-Control']}")
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    
+    # A repeat visitor gets a bodyless 304
+    cached = client.get('/home?page=2', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    
+    # Revalidating on a cold instance builds no services at all
+    import subprocess
+    script = (
+        "import sys, app\n"
+        "etag = app.key_page_etag(2, app.ADDRESSES_PER_PAGE)\n"
+        "response = app.app.test_client().get('/home?page=2', headers={'If-None-Match': etag})\n"
+        "assert response.status_code == 304, response.status_code\n"
+        "assert app._prefetch_service is None and app._all_key_service is None\n"
+        "assert 'ecdsa' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, '-c', script], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    
+    # Other pages have their own ETag
+    other = client.get('/home?page=3')
+    assert other.headers['ETag'] != etag
+    
+    # So does the same page rendered with balance checking switched the other way
+    import app as app_module
+    app_module.ENABLE_BALANCE_CHECKING = not app_module.ENABLE_BALANCE_CHECKING
+    try:
+        assert app_module.key_page_etag(2, app_module.ADDRESSES_PER_PAGE) != etag.strip('"')
+    finally:
+        app_module.ENABLE_BALANCE_CHECKING = not app_module.ENABLE_BALANCE_CHECKING
+    
+    # Pages outside the keyspace redirect to the nearest end, junk is rejected
+    from config import ADDRESSES_PER_PAGE, BITCOIN_MAX_NUMBER
+    max_page = BITCOIN_MAX_NUMBER // ADDRESSES_PER_PAGE
+    assert client.get('/home?page=0').headers['Location'].endswith('page=1')
+    assert client.get('/home?page=-1').headers['Location'].endswith('page=1')
+    assert client.get(f'/home?page={max_page + 1}').headers['Location'].endswith(f'page={max_page}')
+    assert client.get(f'/home?page={max_page}').status_code == 200
+    assert client.get('/home?page=abc').status_code == 400
+    for page in (0, -1, max_page + 1, 'abc'):
+        assert client.get(f'/api/balances?page={page}').status_code == 400
+    
+    print("✓ Key pages are conditionally cacheable")
+    return True
+
+def test_prefetch_service():
+    """Test that neighbors of a served page are pre-generated into the page cache"""
+    print("Testing PrefetchService...")
+    
+    import time
+    from services.prefetch_service import PrefetchService, RequestTracker
+    
+    all_key_service = AllKeyService()
+    tracker = RequestTracker()
+    prefetcher = PrefetchService(all_key_service, tracker=tracker)
+    
+    # Nothing runs while a foreground request is in flight
+    tracker.started()
+    prefetcher.schedule(5)
+    assert prefetcher.pending() == [6, 4]
+    time.sleep(0.2)
+    assert not all_key_service.is_cached(6, 500)
+    
+    tracker.finished()
+    deadline = time.time() + 30
+    while prefetcher.pending() or prefetcher.pages_prefetched < 2:
+        assert time.time() < deadline, "prefetch did not finish"
+        time.sleep(0.05)
+    prefetcher.shutdown()
+    
+    assert all_key_service.is_cached(4, 500)
+    assert all_key_service.is_cached(6, 500)
+    
+    # A request that started before the prefetcher existed still holds it back
+    tracker = RequestTracker()
+    tracker.started()
+    late = PrefetchService(all_key_service, tracker=tracker)
+    assert not late._is_idle()
+    tracker.finished()
+    assert late._is_idle()
+    
+    # Cached pages hand out copies, so callers cannot corrupt the cache
+    items = all_key_service.get_data(6, 500)
+    items[0].address_compressed_balance = 123
+    assert all_key_service.get_data(6, 500)[0].address_compressed_balance is None
+    
+    print("✓ Neighboring pages prefetched")
+    return True
+
+def test_point_checkpoints():
+    """Test that pages started from checkpoints match cold derivation"""
+    print("Testing point checkpoint reuse...")
+    
+    service = AllKeyService()
+    
+    # Cold start, then forward, backward and a few pages away from a checkpoint
+    pages = [10, 11, 9, 13, 7, 1000]
+    for page in pages:
+        for item in service.get_data(page, 5):
+            assert item.address_compressed == service._get_address(item.id, compressed=True)
+            assert item.address_uncompressed == service._get_address(item.id, compressed=False)
+    
+    # A fresh service (no checkpoints) derives exactly the same page
+    cold = AllKeyService().get_data(11, 5)
+    warm = service.get_data(11, 5)
+    assert [item.address_compressed for item in cold] == [item.address_compressed for item in warm]
+    
+    # Checkpoint memory is bounded
+    service.checkpoint_size = 4
+    for page in range(2000, 2010):
+        service.get_data(page, 5)
+    assert len(service._checkpoints) <= 4
+    
+    print(f"✓ {len(pages)} pages identical to cold derivation")
+    return True
+
+def test_generator_table():
+    """Test the memory-mapped generator table against ecdsa"""
+    print("Testing GeneratorTable...")
+    
+    import random
+    import tempfile
+    from ecdsa import SECP256k1
+    from services.generator_table import GeneratorTable
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'generator_table.bin')
+        GeneratorTable(path).load()  # builds and saves the file
+        assert os.path.getsize(path) == GeneratorTable.file_size()
+        
+        table = GeneratorTable(path).load()  # maps the saved file
+        scalars = [1, 255, 256, 2**200, SECP256k1.order - 1] + [random.randrange(1, SECP256k1.order) for _ in range(20)]
+        for scalar in scalars:
+            assert table.multiply(scalar).to_affine() == (SECP256k1.generator * scalar).to_affine()
+    
+    print(f"✓ {len(scalars)} table multiplications match ecdsa")
+    return True
+
+def test_cold_start_budget():
+    """Test that importing the app stays fast and defers crypto/HTTP libraries"""
+    print("Testing cold start...")
+    
+    from startup_report import measure_cold_import
+    from config import STARTUP_IMPORT_BUDGET
+    
+    elapsed, heavy, _ = measure_cold_import()
+    print(f"  Cold import: {elapsed * 1000:.1f} ms")
+    assert elapsed < STARTUP_IMPORT_BUDGET
+    assert heavy == []
+    
+    print("✓ Cold import within budget")
+    return True
+
+def test_batch_search():
+    """Test that one sweep finds many targets and skips undecodable ones"""
+    print("Testing batch search...")
+    
+    from services.search_service import SearchService
+    
+    all_key_service = AllKeyService()
+    search_service = SearchService(all_key_service)
+    
+    page_2 = all_key_service.get_data(2, 20)
+    page_7 = all_key_service.get_data(7, 20)
+    addresses = [page_2[3].address_compressed, page_7[19].address_uncompressed, "not-an-address"]
+    
+    targets, invalid = search_service.build_targets(addresses)
+    assert invalid == ["not-an-address"]
+    
+    matches = list(search_service.search(targets, 1, 10, limit_per_page=20))
+    assert [(m['page'], m['position'], m['address_type']) for m in matches] == [
+        (2, 4, 'p2pkh_compressed'), (7, 20, 'p2pkh_uncompressed')
+    ]
+    assert matches[0]['private_key'] == page_2[3].private_key
+    
+    # Only a JSON object (or a plain-text list) is a valid request body
+    from app import app
+    client = app.test_client()
+    for body in ([], 'x', 3):
+        assert client.post('/api/batch-search', json=body).status_code == 400
+    
+    # Sweeps end at the last page of the keyspace; past it there are no public keys
+    import json
+    from config import ADDRESSES_PER_PAGE, BITCOIN_MAX_NUMBER
+    max_page = BITCOIN_MAX_NUMBER // ADDRESSES_PER_PAGE
+    last_key = all_key_service.get_data(max_page, ADDRESSES_PER_PAGE)[-1]
+    targets, _ = search_service.build_targets([last_key.address_compressed])
+    assert [m['private_key'] for m in search_service.search(targets, max_page, 1)] == [last_key.private_key]
+    for start_page, pages in ((max_page, 2), (max_page + 1, 1)):
+        try:
+            list(search_service.search(targets, start_page, pages))
+            assert False, f"Swept pages {start_page} to {start_page + pages - 1}"
+        except ValueError:
+            pass
+    response = client.get(f'/search?address={last_key.address_compressed}&start_page={max_page}')
+    assert response.status_code == 200 and last_key.private_key.encode() in response.data
+    response = client.get(f'/search?address={last_key.address_compressed}&start_page={max_page + 1}')
+    assert response.status_code == 200 and f'The last page is {max_page}'.encode() in response.data
+    response = client.get(f'/balance-scan?start_page={max_page + 1}&max_pages=1')
+    assert response.status_code == 200 and f'The last page is {max_page}'.encode() in response.data
+    for start_page, pages in ((max_page, 2), (max_page + 1, 1)):
+        response = client.post('/api/batch-search', json={'addresses': [last_key.address_compressed],
+                                                          'start_page': start_page, 'max_pages': pages})
+        assert response.status_code == 400
+    response = client.post('/api/batch-search', json={'addresses': [last_key.address_compressed],
+                                                      'start_page': max_page, 'max_pages': 1}, buffered=True)
+    lines = [json.loads(line) for line in response.data.splitlines()]
+    assert response.status_code == 200 and lines[-1]['type'] == 'done' and lines[-1]['found'] == 1
+    
+    print(f"✓ Found {len(matches)} targets in one sweep")
+    return True
+
+def test_all_address_types():
+    """Test SegWit and Taproot derivation against known vectors and search"""
+    print("Testing all address types...")
+    
+    from services.search_service import SearchService
+    
+    service = AllKeyService()
+    assert service.get_data(1, 3)[0].address_p2tr == ""  # off by default: it costs ~7x per page
+    service = AllKeyService()
+    service.derive_taproot = True
+    
+    # Private key 1 (BIP173 / BIP86 reference addresses)
+    first = service.get_data(1, 3)[0]
+    assert first.address_p2wpkh == "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4"
+    assert first.address_p2sh_p2wpkh == "3JvL6Ymt8MVWiCNHC7oWU6nLeHNJKLZGLN"
+    assert first.address_p2tr == "bc1pmfr3p9j00pfxjh0zmgp99y8zftmd3s5pmedqhyptwy6lm87hf5sspknck9"
+    
+    # Every format is found by search
+    item = service.get_data(3, 10)[6]
+    search_service = SearchService(service)
+    addresses = [item.address_p2wpkh, item.address_p2sh_p2wpkh, item.address_p2tr]
+    targets, invalid = search_service.build_targets(addresses)
+    assert invalid == []
+    matches = list(search_service.search(targets, 1, 5, limit_per_page=10))
+    assert sorted(m['address_type'] for m in matches) == ['p2sh_p2wpkh', 'p2tr', 'p2wpkh']
+    assert all((m['page'], m['position']) == (3, 7) for m in matches)
+    
+    print("✓ P2WPKH, P2SH-P2WPKH and P2TR addresses derived and found")
+    return True
+
+def test_distributed_scan():
+    """Test lease reassignment and a coordinator/worker scan against a local snapshot"""
+    print("Testing distributed scan...")
+    
+    import tempfile
+    import threading
+    from services.balance_snapshot import BalanceSnapshot
+    from services.scan_cluster import ScanCoordinator, ScanWorker, make_coordinator_server
+    
+    # A lease that misses its deadline goes to the next worker that asks
+    now = [0.0]
+    coordinator = ScanCoordinator(1, 5, lease_pages=2, lease_ttl=10, clock=lambda: now[0])
+    first = coordinator.claim('a')
+    second = coordinator.claim('b')
+    assert (first.start_page, second.start_page) == (1, 3)
+    assert coordinator.heartbeat(first.lease_id, 'a')
+    now[0] = 11
+    reassigned = coordinator.claim('c')
+    assert reassigned.lease_id == first.lease_id and reassigned.worker_id == 'c'
+    assert not coordinator.heartbeat(first.lease_id, 'a')
+    assert not coordinator.report(first.lease_id, 'a', [], 20)  # the expired owner's late result
+    assert coordinator.report(first.lease_id, 'c', [], 20)
+    assert not coordinator.report(first.lease_id, 'a', [], 20)  # late duplicate is ignored
+    
+    # End to end: plant balances on derived addresses and let a worker find them
+    service = AllKeyService()
+    planted = service.get_data(2, 10)[3]
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = BalanceSnapshot(os.path.join(directory, 'balances.sqlite'))
+        imported, skipped = snapshot.import_rows([
+            [planted.address_compressed, '5000', '1', '5000'],
+            [planted.address_p2wpkh, '7000', '2', '9000'],
+            ['not-an-address', '1', '1', '1']
+        ])
+        assert (imported, skipped) == (2, 1)
+        
+        # A mistyped path fails instead of scanning against an empty snapshot
+        missing = BalanceSnapshot(os.path.join(directory, 'balance.sqlite'))
+        try:
+            missing.lookup_scripts([b'x'])
+            assert False, "lookup against a missing snapshot should fail"
+        except FileNotFoundError:
+            assert not missing.exists()
+        
+        coordinator = ScanCoordinator(1, 5, lease_pages=2, lease_ttl=30)
+        server = make_coordinator_server(coordinator, '127.0.0.1', 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            worker = ScanWorker(f"http://127.0.0.1:{server.server_address[1]}", snapshot,
+                                all_key_service=service, limit_per_page=10, poll_interval=0.1)
+            worker.run()
+        finally:
+            server.shutdown()
+            server.server_close()
+            snapshot.close()
+    
+    assert coordinator.done and coordinator.pages_done == 5 and coordinator.keys_scanned == 50
+    assert sorted(hit['address_type'] for hit in coordinator.hits) == ['p2pkh_compressed', 'p2wpkh']
+    assert all((hit['page'], hit['position']) == (2, 4) for hit in coordinator.hits)
+    assert all(hit['private_key'] == planted.private_key for hit in coordinator.hits)
+    
+    print(f"✓ {worker.leases_done} leases scanned, {len(coordinator.hits)} planted balances found")
+    return True
+
+def test_snapshot_deltas():
+    """Test applying per-block delta files atomically and idempotently"""
+    print("Testing snapshot deltas...")
+    
+    import tempfile
+    import threading
+    import time
+    from services.balance_snapshot import BalanceSnapshot, MissingBlock
+    
+    items = AllKeyService().get_data(1, 20)
+    sender, receiver = items[0].address_compressed, items[1].address_p2wpkh
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = BalanceSnapshot(os.path.join(directory, 'balances.sqlite'))
+        snapshot.import_rows([[sender, '10000', '1', '10000'], [receiver, '0', '0', '0']], height=100)
+        assert snapshot.height() == 100
+        
+        feed = os.path.join(directory, 'deltas')
+        os.makedirs(feed)
+        with open(os.path.join(feed, '100.csv'), 'w') as f:
+            f.write(f"{sender},1,1,1\n")  # already in the snapshot
+        for height in range(101, 121):
+            # Each block moves 100 sat from sender to receiver
+            moved = (height - 100) * 100
+            name = f"{height}-00000000abcd.csv" if height == 101 else f"{height}.csv"
+            with open(os.path.join(feed, name), 'w') as f:
+                f.write("address,final_balance,n_tx,total_received\n")
+                f.write(f"{sender},{10000 - moved},{1 + height - 100},10000\n")
+                f.write(f"{receiver},{moved},{height - 100},{moved}\n")
+        
+        # A reader on its own connection never sees half a block
+        totals = set()
+        stop = threading.Event()
+        def read():
+            while not stop.is_set():
+                found = snapshot.get_balance([sender, receiver])
+                totals.add(sum(balance.final_balance for balance in found.values()))
+            snapshot.close()
+        reader = threading.Thread(target=read)
+        reader.start()
+        start = time.perf_counter()
+        applied, missing = snapshot.apply_delta_directory(feed)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        reader.join()
+        
+        assert [height for height, _, _ in applied] == list(range(101, 121)) and missing is None
+        assert totals == {10000}
+        assert snapshot.height() == 120
+        result = snapshot.get_balance([sender, receiver])
+        assert result[sender].final_balance == 8000 and result[receiver].total_received == 2000
+        
+        # Re-applying the feed or an old block changes nothing
+        assert snapshot.apply_delta_directory(feed) == ([], None)
+        assert snapshot.apply_delta(110, [[sender, '0', '0', '0']]) is None
+        assert snapshot.get_balance([sender])[sender].final_balance == 8000
+        
+        # A bigger block still applies in one short transaction
+        rows = [[item.address_p2wpkh, str(i), '1', str(i)] for i, item in enumerate(AllKeyService().get_data(2, 500))]
+        start = time.perf_counter()
+        assert snapshot.apply_delta(121, rows) == (500, 0)
+        big = time.perf_counter() - start
+        
+        # A missing block stops the feed there instead of being skipped
+        try:
+            snapshot.apply_delta(123, [[sender, '0', '0', '0']])
+            assert False, "Block 123 applied on top of 121"
+        except MissingBlock as e:
+            assert e.expected == 122
+        with open(os.path.join(feed, '123.csv'), 'w') as f:
+            f.write(f"{sender},7000,30,10000\n")
+        seen = []
+        assert snapshot.apply_delta_directory(feed, lambda height, *_: seen.append(height)) == ([], 122)
+        assert snapshot.height() == 121 and seen == []
+        with open(os.path.join(feed, '122.csv'), 'w') as f:
+            f.write(f"{sender},7500,29,10000\n")
+        applied, missing = snapshot.apply_delta_directory(feed, lambda height, *_: seen.append(height))
+        assert [height for height, _, _ in applied] == [122, 123] and missing is None and seen == [122, 123]
+        assert snapshot.get_balance([sender])[sender].final_balance == 7000
+        snapshot.close()
+    
+    print(f"✓ Applied 20 blocks in {elapsed * 1000:.1f}ms, a 500-address block in {big * 1000:.1f}ms")
+    return True
+
+def test_range_index():
+    """Test range totals from the block index against a brute-force sum"""
+    print("Testing range index...")
+    
+    import random
+    import tempfile
+    import app as app_module
+    from services.balance_snapshot import BalanceSnapshot
+    from services.range_index import FenwickTree, RangeIndex
+    from config import ADDRESSES_PER_PAGE
+    
+    values = [random.randint(-50, 50) for _ in range(37)]
+    tree = FenwickTree(values)
+    for first, last in [(0, 36), (5, 5), (3, 20), (36, 36)]:
+        assert tree.range_sum(first, last) == sum(values[first:last + 1])
+    tree.add(4, 7)
+    assert tree.prefix(5) == sum(values[:5]) + 7
+    
+    # Plant balances on pages 2, 3 and 5 of 10-key pages
+    service = AllKeyService()
+    planted = {2: service.get_data(2, 10)[3], 3: service.get_data(3, 10)[0], 5: service.get_data(5, 10)[9]}
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = BalanceSnapshot(os.path.join(directory, 'balances.sqlite'))
+        snapshot.import_rows([
+            [planted[2].address_compressed, '5000', '1', '5000'],
+            [planted[2].address_p2sh_p2wpkh, '0', '2', '700'],
+            [planted[3].address_uncompressed, '300', '1', '300'],
+            [planted[5].address_p2wpkh, '40', '3', '90']
+        ], height=800000)
+        
+        index = RangeIndex.build(snapshot, service, 1, 6, block_pages=2, limit_per_page=10)
+        snapshot.close()
+        assert (index.blocks, index.end_page, index.height) == (3, 6, 800000)
+        assert index.query(1, 6) == {'start_page': 1, 'end_page': 6, 'total_balance': 5340,
+                                     'total_received': 6090, 'funded_addresses': 3}
+        # Rounded out to blocks 3-4 and 5-6
+        assert index.query(4, 5) == {'start_page': 3, 'end_page': 6, 'total_balance': 340,
+                                     'total_received': 390, 'funded_addresses': 2}
+        assert index.query(1, 2)['total_received'] == 5700
+        assert index.query(0, 100)['end_page'] == 6
+        assert index.query(7, 9) is None
+        
+        path = os.path.join(directory, 'range_index.bin')
+        index.save(path)
+        loaded = RangeIndex.load(path)
+        assert loaded.stats() == index.stats() and loaded.query(3, 4) == index.query(3, 4)
+        assert RangeIndex.load(os.path.join(directory, 'missing.bin')) is None
+        high = RangeIndex(2 ** 200, 4, 10, [[1, 2], [3, 4], [0, 1]])
+        high.save(path)
+        assert RangeIndex.load(path).query(2 ** 200 + 5, 2 ** 200 + 7)['total_balance'] == 2
+        
+        # The API answers from the saved index
+        RangeIndex(1, 10, ADDRESSES_PER_PAGE, [list(range(100)), [2] * 100, [1] * 100], 5).save(path)
+        original_path = app_module.RANGE_INDEX_PATH
+        app_module.RANGE_INDEX_PATH = path
+        try:
+            client = app_module.app.test_client()
+            data = client.get('/api/range-totals?start_page=15&end_page=35').get_json()
+            assert (data['start_page'], data['end_page']) == (11, 40)
+            assert (data['total_balance'], data['total_received'], data['funded_addresses']) == (6, 6, 3)
+            assert client.get('/api/range-totals?start_page=5000').status_code == 404
+            assert client.get('/api/range-totals?start_page=9&end_page=2').status_code == 400
+        finally:
+            app_module.RANGE_INDEX_PATH = original_path
+            app_module._range_index = (None, None)
+    
+    print(f"✓ Range totals over {index.blocks} blocks match the planted balances")
+    return True
+
+def test_key_export():
+    """Test the columnar binary export against the derived pages"""
+    print("Testing key export...")
+    
+    import io
+    import tempfile
+    import app as app_module
+    from services.balance_snapshot import BalanceSnapshot
+    from services.key_export import KeyExporter, balance_values, read_raw
+    from config import ADDRESSES_PER_PAGE, BITCOIN_MAX_NUMBER
+    
+    service = AllKeyService()
+    expected = list(service.iter_page_hashes(4, 3, 10))
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = BalanceSnapshot(os.path.join(directory, 'balances.sqlite'))
+        planted = service.get_data(5, 10)[6]
+        snapshot.import_rows([[planted.address_compressed, '5000', '1', '6000'],
+                              [planted.address_uncompressed, '70', '1', '80']])
+        
+        # A tiny buffer forces several chunks
+        exporter = KeyExporter(service, snapshot, limit_per_page=10, buffer_bytes=500)
+        chunks = list(exporter.iter_raw(4, 3))
+        snapshot.close()
+    assert len(chunks) > 1 and exporter.keys_exported == 30
+    
+    batches = list(read_raw(io.BytesIO(b''.join(chunks))))
+    assert len(batches) == 3
+    for columns, (page, first_key, rows) in zip(batches, expected):
+        assert columns['key'][:32] == first_key.to_bytes(32, 'big')
+        assert columns['key'][-32:] == (first_key + 9).to_bytes(32, 'big')
+        assert columns['hash160_compressed'] == b''.join(row[1] for row in rows)
+        assert columns['hash160_uncompressed'] == b''.join(row[0] for row in rows)
+    page_five = batches[1]
+    assert balance_values(page_five['compressed_balance'])[6] == 5000
+    assert balance_values(page_five['compressed_received'])[6] == 6000
+    assert balance_values(page_five['uncompressed_balance']).tolist() == [0] * 6 + [70] + [0] * 3
+    assert sum(balance_values(batches[0]['compressed_received'])) == 0
+    
+    # The endpoint streams the same format; no snapshot means no balance columns
+    client = app_module.app.test_client()
+    response = client.get('/api/export?start_page=2&pages=1', buffered=True)
+    assert response.status_code == 200 and response.mimetype == 'application/octet-stream'
+    batches = list(read_raw(io.BytesIO(response.data)))
+    assert len(batches) == 1 and set(batches[0]) == {'key', 'hash160_compressed', 'hash160_uncompressed'}
+    assert batches[0]['key'][:32] == (ADDRESSES_PER_PAGE + 1).to_bytes(32, 'big')
+    assert client.get('/api/export?pages=0').status_code == 400
+    
+    # The last page exports; the start page does not fit in 64 bits
+    last_page = BITCOIN_MAX_NUMBER // ADDRESSES_PER_PAGE
+    response = client.get(f'/api/export?start_page={last_page}&pages=1', buffered=True)
+    batches = list(read_raw(io.BytesIO(response.data)))
+    assert batches[0]['key'][-32:] == (last_page * ADDRESSES_PER_PAGE).to_bytes(32, 'big')
+    assert client.get(f'/api/export?start_page={last_page}&pages=2').status_code == 400
+    
+    # The export holds a heavy-lane slot while the body streams
+    heavy = app_module._admission_controller.lanes['heavy']
+    key_service = app_module.get_all_key_service()
+    seen = []
+    def iter_page_hashes(*args, **kwargs):
+        seen.append(heavy.active)
+        return iter(())
+    key_service.iter_page_hashes = iter_page_hashes
+    try:
+        response = client.get('/api/export?start_page=1&pages=2')
+        assert response.status_code == 200 and len(response.data) == KeyExporter.HEADER.size
+        assert seen == [1]
+        response.close()
+        assert heavy.active == 0
+    finally:
+        del key_service.iter_page_hashes
+    
+    print(f"✓ Exported {exporter.keys_exported} keys in {len(chunks)} chunks and streamed a page over HTTP")
+    return True
+
+def test_balance_providers():
+    """Test hedged requests and circuit breakers against local stand-in providers"""
+    print("Testing balance providers...")
+    
+    from models.blockchain import Blockchain
+    from services.balance_providers import BlockchainInfoProvider, EsploraProvider, SnapshotProvider
+    from services.mock_balance_server import MockBalanceServer
+    
+    address = '1BoatSLRHtKNngkdXEeobR76b53LETtpyT'
+    balances = {address: (5000, 2, 9000)}
+    
+    # Every primary response is slow: the hedge to the second provider answers first
+    with MockBalanceServer(balances, slow_rate=1.0, slow_latency=0.5) as slow, MockBalanceServer(balances) as fast:
+        service = BalanceService([BlockchainInfoProvider(slow.blockchain_info_url), EsploraProvider(fast.url)])
+        service.hedge_default_delay = 0.05
+        result = service.get_balance([address, '1111111111111111111114oLvT2'])
+        assert result[address].final_balance == 5000 and result[address].total_received == 9000
+        assert service.page_latency.percentile(0.99) < 0.5
+        assert service.hedges == 1 and service.hedge_wins == 1
+    
+    # A failing primary fails over at once and is skipped after its breaker opens
+    with MockBalanceServer(balances, error_rate=1.0) as failing, MockBalanceServer(balances) as healthy:
+        primary = BlockchainInfoProvider(failing.blockchain_info_url)
+        service = BalanceService([primary, BlockchainInfoProvider(healthy.blockchain_info_url)])
+        service.cache_ttl = 0
+        for _ in range(primary.breaker.failure_threshold + 3):
+            assert service.get_balance([address])[address].final_balance == 5000
+        assert primary.breaker.state == 'open'
+        assert failing.requests == primary.breaker.failure_threshold
+        assert service.failed_chunks == 0
+    
+    # A chunk no provider answered reads as zero but is not cached, in the service or over HTTP
+    import app as app_module
+    with MockBalanceServer(balances, error_rate=1.0) as flaky:
+        service = BalanceService([BlockchainInfoProvider(flaky.blockchain_info_url)])
+        failed = []
+        assert service.get_balance([address], failed)[address].final_balance == 0 and failed == [address]
+        flaky.error_rate = 0.0
+        assert service.get_balance([address])[address].final_balance == 5000
+        assert service.failed_chunks == 1
+        
+        saved = app_module._balance_service
+        try:
+            for error_rate, cache_control in ((1.0, 'no-store'), (0.0, f'public, max-age={app_module.BALANCE_CACHE_TTL}')):
+                flaky.error_rate = error_rate
+                app_module._balance_service = BalanceService([BlockchainInfoProvider(flaky.blockchain_info_url)])
+                response = app_module.app.test_client().get('/api/balances?page=1')
+                assert response.status_code == 200 and response.headers['Cache-Control'] == cache_control
+        finally:
+            app_module._balance_service = saved
+    
+    # Background warming only spends the upstream budget visitors left over
+    from config import API_CHUNK_SIZE
+    with MockBalanceServer(balances) as server:
+        service = BalanceService([BlockchainInfoProvider(server.blockchain_info_url)])
+        service.request_delay = 60
+        service.request_burst = service._budget = 2
+        service.warm([f"address{i}" for i in range(2 * API_CHUNK_SIZE)])
+        assert server.requests == 2
+        service.warm([address])
+        assert server.requests == 2 and service.warmups_skipped == 1
+        assert service.get_balance([address])[address].final_balance == 5000
+        assert server.requests == 3
+    
+    # Esplora answers a chunk with parallel per-address requests under one deadline
+    import time
+    with MockBalanceServer(balances, latency=0.1) as esplora:
+        provider = EsploraProvider(esplora.url, max_concurrent=8)
+        addresses = [address] + [f"address{i}" for i in range(15)]
+        start = time.perf_counter()
+        result = provider.fetch(addresses, timeout=5)
+        assert time.perf_counter() - start < 0.8  # one at a time would take 1.6s
+        assert result[address].total_received == 9000 and len(result) == 16
+        try:
+            provider.fetch(addresses, timeout=0.15)
+            assert False, "slow chunk should have timed out"
+        except TimeoutError:
+            pass
+    
+    # With nothing reachable the local snapshot still answers
+    class Snapshot:
+        def exists(self):
+            return True
+        def get_balance(self, addresses):
+            return {address: Blockchain(1, 1, 1)} if address in addresses else {}
+    
+    with MockBalanceServer(error_rate=1.0) as failing:
+        service = BalanceService([BlockchainInfoProvider(failing.blockchain_info_url), SnapshotProvider(Snapshot())])
+        result = service.get_balance([address, '1111111111111111111114oLvT2'])
+        assert result[address].final_balance == 1
+        assert result['1111111111111111111114oLvT2'].final_balance == 0
+    
+    print(f"✓ Hedged, failed over and tripped breakers; stats: {service.stats()['page_latency']}")
+    return True
+
+def test_shared_cache():
+    """Test that pages and balances cached by one process are hits in another"""
+    print("Testing shared cache...")
+    
+    import subprocess
+    import tempfile
+    from models.blockchain import Blockchain
+    from services.shared_cache import SharedCache
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'cache.bin')
+        
+        # Another worker process derives page 7 and fetches a balance
+        script = (
+            "from services.all_key_service import AllKeyService\n"
+            "from services.shared_cache import SharedCache\n"
+            "from models.blockchain import Blockchain\n"
+            f"cache = SharedCache({path!r}, size_mb=1, rows_per_page=10)\n"
+            "AllKeyService(cache).get_data(7, 10)\n"
+            "cache.put_balances({'1BoatSLRHtKNngkdXEeobR76b53LETtpyT': Blockchain(5000, 2, 9000)})\n"
+        )
+        subprocess.run([sys.executable, '-c', script], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        
+        cache = SharedCache(path, size_mb=1, rows_per_page=10)
+        service = AllKeyService(cache)
+        shared_items = service.get_data(7, 10)
+        assert cache.page_hits == 1 and cache.page_misses == 0
+        assert shared_items == AllKeyService().get_data(7, 10)
+        
+        balances = cache.get_balances(['1BoatSLRHtKNngkdXEeobR76b53LETtpyT', '1111111111111111111114oLvT2'], 60)
+        assert balances == {'1BoatSLRHtKNngkdXEeobR76b53LETtpyT': Blockchain(5000, 2, 9000)}
+        assert cache.get_balances(['1BoatSLRHtKNngkdXEeobR76b53LETtpyT'], -1) == {}  # past its TTL
+        
+        # The budget is fixed: filling it replaces old pages instead of growing
+        for page in range(1, cache.page_slots * 3):
+            cache.put_page(page, 10, service._page_rows((page - 1) * 10 + 1, 10, False))
+        assert os.path.getsize(cache.path) == cache.file_size
+        assert cache.get_page(cache.page_slots * 3 - 1, 10) is not None
+        
+        # Invalid pages are rejected before they reach the cache
+        misses = cache.page_misses
+        for page in (0, -1):
+            try:
+                service.get_data(page, 10)
+                assert False, "invalid page should have been rejected"
+            except ValueError:
+                pass
+        assert cache.page_misses == misses
+        cache.close()
+    
+    print(f"✓ Page and balance hits across processes within a {cache.file_size:,} byte budget")
+    return True
+
+def test_admission_control():
+    """Test that saturated heavy routes are queued or shed while browsing keeps working"""
+    print("Testing admission control...")
+    
+    import threading
+    from services.admission_control import AdmissionLane, Overloaded
+    from config import ADDRESSES_PER_PAGE
+    
+    # One running, one queued, the next is shed at once with a Retry-After hint
+    lane = AdmissionLane('heavy', max_concurrent=1, queue_size=1, queue_timeout=2, max_cost=1000)
+    first = lane.acquire(600)
+    queued = threading.Thread(target=lambda: lane.release(lane.acquire(600), 0.01))
+    queued.start()
+    while lane.stats()['queue_depth'] == 0:
+        pass
+    try:
+        lane.acquire(100)
+        assert False, "request should have been shed"
+    except Overloaded as e:
+        assert e.retry_after >= 1
+    lane.release(first, 1.0)
+    queued.join()
+    stats = lane.stats()
+    assert (stats['admitted'], stats['shed'], stats['active'], stats['queue_depth']) == (2, 1, 0, 0)
+    
+    # Costs share the budget: two small requests run together, a third waits
+    lane = AdmissionLane('heavy', max_concurrent=3, queue_size=0, max_cost=1000)
+    lane.acquire(400)
+    lane.acquire(400)
+    try:
+        lane.acquire(400)
+        assert False, "request over the cost budget should have been shed"
+    except Overloaded:
+        pass
+    
+    # Through the app: heavy routes get 503 + Retry-After, pages still render
+    import app as app_module
+    heavy = app_module._admission_controller.lanes['heavy']
+    held = [heavy.acquire(0) for _ in range(heavy.max_concurrent)]
+    queue_size, heavy.queue_size = heavy.queue_size, 0
+    try:
+        client = app_module.app.test_client()
+        response = client.get('/search?address=1BoatSLRHtKNngkdXEeobR76b53LETtpyT')
+        assert response.status_code == 503 and int(response.headers['Retry-After']) >= 1
+        assert client.get('/home?page=1').status_code == 200
+        assert client.get('/api/admission-stats').get_json()['heavy']['shed'] >= 1
+    finally:
+        heavy.queue_size = queue_size
+        for cost in held:
+            heavy.release(cost, 0.0)
+    
+    # A streamed sweep keeps its slot until the body has been sent
+    search_service = app_module.get_search_service()
+    seen = []
+    def search(targets, start_page, max_pages):
+        seen.append((heavy.active, heavy.cost_in_flight))
+        return iter(())
+    search_service.search = search
+    try:
+        client = app_module.app.test_client()
+        response = client.post('/api/batch-search', json={'addresses': ['1BoatSLRHtKNngkdXEeobR76b53LETtpyT'],
+                                                          'max_pages': 3})
+        assert response.status_code == 200 and b'"done"' in response.data
+        assert seen == [(1, 3 * ADDRESSES_PER_PAGE)]
+        response.close()  # what the server does once the body is sent
+        assert heavy.active == 0 and heavy.cost_in_flight == 0
+    finally:
+        del search_service.search
+    
+    print("✓ Heavy requests queued and shed; browsing unaffected")
+    return True
+
+def test_load_test_harness():
+    """Test the mock API's rate limit and a short load run against a real server process"""
+    print("Testing load test harness...")
+    
+    import argparse
+    import requests
+    import load_test
+    from services.mock_balance_server import MockBalanceServer
+    
+    with MockBalanceServer(rate_limit=1, burst=2) as mock:
+        statuses = [requests.get(mock.blockchain_info_url, params={'active': 'a'}).status_code for _ in range(4)]
+        assert statuses[:2] == [200, 200] and statuses[2:] == [429, 429]
+        assert mock.rate_limited == 2
+    
+    args = argparse.Namespace(mix='home=1,random=1', concurrency=2, duration=2, page_range=20, scan_pages=1,
+                              timeout=30, mock_latency=0.01, mock_error_rate=0.0, mock_rate_limit=0, mock_burst=5)
+    result = load_test.run_configuration({'ENABLE_PREFETCH': False}, args)
+    assert set(result['routes']) == {'home', 'random'}
+    for stats in result['routes'].values():
+        assert stats['requests'] > 0 and stats['errors'] == 0
+        assert stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms']
+    
+    print(f"✓ Load run completed: {result['routes']['home']['ok']} pages, {result['routes']['random']['ok']} redirects")
+    return True
+
 def main():
     """Run all tests"""
     print("=" * 50)
@@ -114,7 +912,22 @@ def main():
     tests = [
         test_all_key_service,
         test_balance_service,
-        test_integration
+        test_integration,
+        test_key_page_caching,
+        test_prefetch_service,
+        test_point_checkpoints,
+        test_generator_table,
+        test_cold_start_budget,
+        test_batch_search,
+        test_all_address_types,
+        test_distributed_scan,
+        test_snapshot_deltas,
+        test_range_index,
+        test_key_export,
+        test_balance_providers,
+        test_shared_cache,
+        test_admission_control,
+        test_load_test_harness
     ]
     
     passed = 0